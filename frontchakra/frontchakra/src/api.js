@@ -33,6 +33,9 @@ async function adminSupportList(params = {}) {
   const qs = new URLSearchParams(params).toString();
   return request(`/admin/support${qs ? `?${qs}` : ""}`, { auth: true });
 }
+async function adminSupportCounts() {
+  return request("/admin/support/counts", { auth: true });
+}
 async function adminSupportSetResolved(id, resolved) {
   return request(`/admin/support/${id}`, {
     method: "PATCH",
@@ -73,6 +76,12 @@ async function userFindByEmail(email) {
   });
 }
 
+async function usersSearch(q, centerId) {
+  // GET /users/search?q=...&center_id=... (typeahead, approved non-members)
+  const qs = new URLSearchParams({ q, center_id: centerId }).toString();
+  return request(`/users/search?${qs}`, { auth: true });
+}
+
 async function centerAddMember(centerId, userId) {
   return request(`/centers/${centerId}/members`, {
     method: "POST",
@@ -144,10 +153,14 @@ export const api = {
   me: () => request("/me", { auth: true }),
 
   // admin
-  adminPending: () => request("/admin/pending", { auth: true }),
+  adminPending: (after) => request(`/admin/pending${after ? `?after=${encodeURIComponent(after)}` : ""}`, { auth: true }),
   adminApprove: (userId) => request(`/admin/approve/${userId}`, { method: "PATCH", auth: true }),
   adminReject: (userId) => request(`/admin/reject/${userId}`, { method: "PATCH", auth: true }),
-  adminUsers: () => request("/admin/users", { auth: true }),
+  adminUsers: (params = {}) => {
+    const qs = new URLSearchParams(Object.entries(params).filter(([, v]) => v)).toString();
+    return request(`/admin/users${qs ? `?${qs}` : ""}`, { auth: true });
+  },
+  adminUserCounts: () => request("/admin/users/counts", { auth: true }),
     adminUserUpdateEmail,
   adminUserSetPassword,
   adminUserDelete,
@@ -158,6 +171,7 @@ export const api = {
   centerUpdate: (id, payload) => request(`/centers/${id}`, { method: "PATCH", auth: true, body: payload }),
   centerDelete: (id) => request(`/centers/${id}`, { method: "DELETE", auth: true }),
   centerMembers: (centerId) => request(`/centers/${centerId}/members`, { auth: true }),
+  myContacts: () => request("/me/contacts", { auth: true }),
   centerAddMember: (centerId, userId) =>
     request(`/centers/${centerId}/members`, { method: "POST", auth: true, body: { user_id: userId } }),
   centerRemoveMember: (centerId, userId) =>
@@ -173,6 +187,10 @@ export const api = {
     request(`/centers/${centerId}/schedule`, { method: "PUT", auth: true, body: { medic_id, date } }),
   scheduleUnassign: (centerId, date) =>
     request(`/centers/${centerId}/schedule/${date}`, { method: "DELETE", auth: true }),
+  scheduleAutoFill: (centerId, yyyymm) =>
+    request(`/centers/${centerId}/schedule/auto?month=${yyyymm}`, { method: "POST", auth: true }),
+  centerAvailability: (centerId, yyyymm) =>
+    request(`/centers/${centerId}/availability?month=${yyyymm}`, { auth: true }),
 
   // my schedule + busy days
   mySchedule: (yyyymm) => request(`/my/schedule?month=${yyyymm}`, { auth: true }),
@@ -181,10 +199,19 @@ export const api = {
   myBusyRemove: (date) => request(`/my/busy/${date}`, { method: "DELETE", auth: true }),
 
   // messaging
-  conversations: () => request(`/conversations`, { auth: true }),
+  conversations: (since) =>
+    request(`/conversations${since ? `?since=${encodeURIComponent(since)}` : ""}`, { auth: true }),
   messagesGet: (conversation_id) => request(`/messages/${conversation_id}`, { auth: true }),
   messageSend: (to_user_id, content) =>
     request(`/messages`, { method: "POST", auth: true, body: { to_user_id, content } }),
+  messagesMarkRead: (conversation_id) =>
+    request(`/messages/${conversation_id}/read`, { method: "POST", auth: true }),
+  // EventSource can't send headers: trade the token for a short-lived stream ticket
+  messageStream: async () => {
+    if (!getToken()) return null;
+    const { ticket } = await request("/messages/stream/ticket", { method: "POST", auth: true });
+    return new EventSource(`${BASE_URL}/messages/stream?jwt=${encodeURIComponent(ticket)}`);
+  },
 
   //profile updates
   profileUpdate,
@@ -202,6 +229,8 @@ export const api = {
   supportMessage,
   adminSupportList,
   adminSupportSetResolved,
+  adminSupportCounts,
 
   usersBasics,
+  usersSearch,
 };
@@ -12,10 +12,6 @@ import CalendarGrid from "../components/CalendarGrid";
 import { useAuth } from "../auth";
 
 function yyyymm(d){ return `${d.getFullYear()}-${String(d.getMonth()+1).padStart(2,"0")}`; }
-function todayStr(){
-  const t = new Date();
-  return `${t.getFullYear()}-${String(t.getMonth()+1).padStart(2,"0")}-${String(t.getDate()).padStart(2,"0")}`;
-}
 function fullName(u){
   if (!u) return "";
   const name = [u.first_name, u.last_name].filter(Boolean).join(" ").trim();
@@ -39,10 +35,12 @@ export default function Centers() {
   const assignDlg = useDisclosure();
   const [assignDate, setAssignDate] = useState("");
   const [assignMedic, setAssignMedic] = useState("");
+  const [availability, setAvailability] = useState({}); // user_id -> one char per day (f/b/e/h)
 
   // Members tab state
   const [addEmail, setAddEmail] = useState("");
   const [adding, setAdding] = useState(false);
+  const [suggestions, setSuggestions] = useState([]); // typeahead: approved users not yet in this center
   const [removingId, setRemovingId] = useState(null);
 
   // Auto-assign state
@@ -109,7 +107,16 @@ export default function Centers() {
     setMembersById(map);
 
     const myMember = list.find(m => m.user_id === me.id);
-    setIsLead(me.global_role === "admin" || myMember?.role === "lead");
+    const lead = me.global_role === "admin" || myMember?.role === "lead";
+    setIsLead(lead);
+    return lead;
+  }
+
+  async function loadAvailability(cId, mStr) {
+    const data = await api.centerAvailability(cId, mStr);
+    const m = {};
+    (data.members || []).forEach(r => { m[r.user_id] = r.states; });
+    setAvailability(m);
   }
 
 async function loadSchedule(cId, mStr) {
@@ -133,7 +140,9 @@ async function loadSchedule(cId, mStr) {
     if (!cId) return;
     setLoading(true);
     try {
-      await Promise.all([loadMembers(cId), loadSchedule(cId, mStr)]);
+      const [lead] = await Promise.all([loadMembers(cId), loadSchedule(cId, mStr)]);
+      if (lead) await loadAvailability(cId, mStr);
+      else setAvailability({});
     } catch (e) {
       toast({ status:"error", title:e.message });
     } finally {
@@ -180,88 +189,11 @@ const autoAssignMonth = async () => {
     return;
   }
 
-  // helpers
-  const toYMD = (d) => {
-    const y = d.getFullYear();
-    const m = String(d.getMonth() + 1).padStart(2, "0");
-    const dd = String(d.getDate()).padStart(2, "0");
-    return `${y}-${m}-${dd}`;
-  };
-  const addDays = (ymd, delta) => {
-    const [y, m, d] = ymd.split("-").map(Number);
-    const dt = new Date(y, m - 1, d);
-    dt.setDate(dt.getDate() + delta);
-    return toYMD(dt);
-  };
-  const today = todayStr();
-
   setAutoAssigning(true);
   try {
-    // eligible pool (include leads too; change to m.role === "medic" if you want medics-only)
-    const eligible = members
-      .filter(m => ["medic", "lead"].includes(m.role))
-      .map(m => m.user_id);
-
-    if (eligible.length === 0) {
-      toast({ status: "warning", title: "No eligible members to assign." });
-      setAutoAssigning(false);
-      return;
-    }
-
-    // current counts & a working assignments map we can reference while we go
-    const counts = Object.fromEntries(eligible.map(id => [id, 0]));
-    const current = {};
-    Object.entries(daysMap).forEach(([d, info]) => {
-      if (info?.assigned && info.medic_id) {
-        current[d] = info.medic_id;
-        if (counts[info.medic_id] != null) counts[info.medic_id] += 1;
-      } else {
-        current[d] = null;
-      }
-    });
-
-    // targets: unassigned, not in past, chronological
-    const datesToFill = Object.keys(current)
-      .filter(d => !current[d] && d >= today)
-      .sort();
-
-    let assigned = 0;
-
-    for (const date of datesToFill) {
-      // prefer lowest-count medics first (for fairness)
-      const baseOrder = eligible.slice().sort((a, b) => counts[a] - counts[b]);
-
-      // try to avoid assigning the same medic as prev/next day
-      const prevDate = addDays(date, -1);
-      const nextDate = addDays(date, +1);
-      const prevMedic = current[prevDate] || null;
-      const nextMedic = current[nextDate] || null;
-
-      const preferred = baseOrder.filter(id => id !== prevMedic && id !== nextMedic);
-      const fallback = baseOrder; // if preferred all fail, allow consecutive days
-
-      const tryAssignFrom = async (list) => {
-        for (const uid of list) {
-          try {
-            await api.scheduleAssign(centerId, uid, date);
-            // reflect immediately in our local state so the next iterations see it
-            current[date] = uid;
-            counts[uid] += 1;
-            assigned += 1;
-            return true;
-          } catch (e) {
-            // skip on any conflict (busy, double-booked, already taken due to races)
-            continue;
-          }
-        }
-        return false;
-      };
-
-      // 1) prefer not-consecutive
-      let placed = await tryAssignFrom(preferred);
-      // 2) if not possible, allow consecutive
-      if (!placed) await tryAssignFrom(fallback);
-    }
+    // server solves the whole month in one go (fairness + no consecutive days when possible)
+    const res = await api.scheduleAutoFill(centerId, monthStr);
+    const assigned = (res.assigned || []).length;
 
     await refreshAll();
     toast({ status: "success", title: `Auto-assigned ${assigned} day(s)` });
@@ -274,6 +206,31 @@ const autoAssignMonth = async () => {
 
 
   // ---------- Members ----------
+  useEffect(() => {
+    const term = addEmail.trim();
+    if (!isLead || !centerId || term.length < 2) { setSuggestions([]); return; }
+    const t = setTimeout(async () => {
+      try { setSuggestions((await api.usersSearch(term, centerId)).users || []); }
+      catch { setSuggestions([]); }
+    }, 200);
+    return () => clearTimeout(t);
+  }, [addEmail, centerId, isLead]);
+
+  const addMemberUser = async (u) => {
+    setAdding(true);
+    try {
+      await api.centerAddMember(centerId, u.id);
+      setAddEmail("");
+      setSuggestions([]);
+      await loadMembers(centerId);
+      toast({ status:"success", title:`Added ${fullName(u)}` });
+    } catch (e) {
+      toast({ status:"error", title: e.message || "Failed to add member" });
+    } finally {
+      setAdding(false);
+    }
+  };
+
   const addMemberByEmail = async () => {
     const email = addEmail.trim().toLowerCase();
     if (!email) return toast({ status:"warning", title:"Enter an email" });
@@ -378,9 +335,11 @@ const autoAssignMonth = async () => {
                     >
                       {members.map(m => {
                         const disp = fullName(m) || m.user_id;
+                        const st = availability[m.user_id]?.[Number(assignDate.slice(8, 10)) - 1];
+                        const note = { b: " (ocupat)", e: " (programat in alt centru)" }[st] || "";
                         return (
-                          <option key={m.user_id} value={m.user_id}>
-                            {disp}
+                          <option key={m.user_id} value={m.user_id} disabled={!!note}>
+                            {disp}{note}
                           </option>
                         );
                       })}
@@ -410,7 +369,7 @@ const autoAssignMonth = async () => {
                   <FormLabel mb={1}>Adauga membru</FormLabel>
                   <HStack>
                     <Input
-                      placeholder="user@example.com"
+                      placeholder="Nume sau email"
                       value={addEmail}
                       onChange={(e)=>setAddEmail(e.target.value)}
                     />
@@ -418,6 +377,23 @@ const autoAssignMonth = async () => {
                       Adauga
                     </Button>
                   </HStack>
+                  {suggestions.length > 0 && (
+                    <Box mt={1} border="1px" borderColor={borderCol} rounded="md" bg={panelBg}>
+                      {suggestions.map(u => (
+                        <Button
+                          key={u.id}
+                          variant="ghost"
+                          size="sm"
+                          width="100%"
+                          justifyContent="flex-start"
+                          isDisabled={adding}
+                          onClick={() => addMemberUser(u)}
+                        >
+                          {fullName(u)} <Text as="span" ml={2} color={mutedText}>{u.email}</Text>
+                        </Button>
+                      ))}
+                    </Box>
+                  )}
                   <Text mt={1} fontSize="sm" color={mutedText}>
                     Utilizatorul trebuie sa existe si sa fie aprobat.
                   </Text>
@@ -58,6 +58,8 @@ export default function Inbox() {
 
   // directory for names
   const [centers, setCenters] = useState([]);
+  const convCursor = useRef(null); // newest conversation timestamp seen, for ?since= polls
+  const [contacts, setContacts] = useState([]); // [{ id, first_name, last_name, email, phone, centers: {center_id: role} }]
   const [userMap, setUserMap] = useState({}); // { user_id: { first_name, last_name, email } }
 
   // conversations + active thread
@@ -92,21 +94,17 @@ export default function Inbox() {
   useEffect(() => {
     (async () => {
       try {
-        const c = await api.centersList();
+        const c = await api.myContacts();
         setCenters(c.centers || []);
+        setContacts(c.contacts || []);
         const map = {};
-        for (const center of c.centers || []) {
-          try {
-            const m = await api.centerMembers(center._id);
-            (m.members || []).forEach(u => {
-              map[u.user_id] = map[u.user_id] || {
-                first_name: u.first_name,
-                last_name: u.last_name,
-                email: u.email
-              };
-            });
-          } catch { /* ignore per-center errors */ }
-        }
+        (c.contacts || []).forEach(u => {
+          map[u.id] = {
+            first_name: u.first_name,
+            last_name: u.last_name,
+            email: u.email
+          };
+        });
         setUserMap(map);
       } catch (e) {
         toast({ status: "error", title: e.message });
@@ -120,6 +118,7 @@ export default function Inbox() {
     const data = await api.conversations();
     const convs = data.conversations || [];
     setConversations(convs);
+    convCursor.current = data.cursor || convCursor.current;
 
     // pick first active if none
     if (!active && convs?.[0]?.conversation_id) {
@@ -171,6 +170,10 @@ export default function Inbox() {
     try {
       const data = await api.messagesGet(cid);
       setMessages(data.messages || []);
+      // clear the unread badge for the thread we're looking at
+      if (conversations.find(c => c.conversation_id === cid)?.unread) {
+        api.messagesMarkRead(cid).catch(() => {});
+      }
       if (!silent) setTimeout(scrollToBottom, 0);
     } catch (e) {
       if (!silent) toast({ status: "error", title: e.message });
@@ -182,9 +185,48 @@ export default function Inbox() {
   useEffect(() => { loadConvos({ silent: false }); }, []);
   useEffect(() => { if (active) loadMessages(active, { silent: false }); }, [active]);
 
-  // ---------- silent polling (no spinners) ----------
-  useInterval(() => { loadConvos({ silent: true }); }, 1000, true);
-  useInterval(() => { if (active) loadMessages(active, { silent: true }); }, 1000, !!active);
+  // ---------- live updates: server-sent events, full polling only while the stream is down ----------
+  // The stream only carries messages handled by the API process it is connected to (unless the
+  // server runs MESSAGE_STREAM_BACKEND=changestream), so a slow ?since= poll stays on as a safety net.
+  const [streaming, setStreaming] = useState(false);
+  const onStreamEvent = useRef(null);
+  onStreamEvent.current = (ev) => {
+    loadConvos({ silent: true });
+    if (active && ev?.message?.conversation_id === active) loadMessages(active, { silent: true });
+  };
+  useEffect(() => {
+    let es = null, retry = null, stopped = false;
+    const connect = async () => {
+      try { es = await api.messageStream(); } catch { es = null; }
+      if (stopped) { es?.close(); return; }
+      if (!es) { retry = setTimeout(connect, 10000); return; }
+      es.onopen = () => setStreaming(true);
+      es.onerror = () => {
+        setStreaming(false);
+        // a transient drop reconnects by itself; once closed (expired ticket, or 503 at the server stream cap) fetch a new ticket later
+        if (es.readyState === EventSource.CLOSED) retry = setTimeout(connect, 30000);
+      };
+      es.onmessage = (e) => {
+        try { onStreamEvent.current(JSON.parse(e.data)); } catch { /* ignore malformed events */ }
+      };
+    };
+    connect();
+    return () => { stopped = true; clearTimeout(retry); es?.close(); };
+  }, []);
+
+  // ---------- silent polling fallback (no spinners) ----------
+  const safetyPoll = async () => {
+    try {
+      const d = await api.conversations(convCursor.current);
+      const changed = d.conversations || [];
+      if (!changed.length) return;
+      loadConvos({ silent: true });
+      if (active && changed.some(c => c.conversation_id === active)) loadMessages(active, { silent: true });
+    } catch { /* next tick */ }
+  };
+  useInterval(safetyPoll, 15000, streaming);
+  useInterval(() => { loadConvos({ silent: true }); }, 1000, !streaming);
+  useInterval(() => { if (active) loadMessages(active, { silent: true }); }, 1000, !!active && !streaming);
 
   // ---------- labels ----------
   const displayForUserId = (userId) => {
@@ -249,11 +291,11 @@ export default function Inbox() {
     setSelRecipient("");
     setNewBody("");
     if (!centerId) return setRecipients([]);
-    try {
-      const m = await api.centerMembers(centerId);
-      const list = (m.members || []).filter(u => u.user_id !== me.id);
-      setRecipients(list);
-    } catch {}
+    setRecipients(
+      contacts
+        .filter(u => u.centers?.[centerId] && u.id !== me.id)
+        .map(u => ({ ...u, user_id: u.id, role: u.centers[centerId] }))
+    );
   };
 
   const sendNew = async () => {
@@ -316,7 +358,12 @@ export default function Inbox() {
                   onClick={() => setActive(c.conversation_id)}
                 >
                   <HStack justify="space-between">
-                    <Text fontWeight="semibold">{convLabel(c)}</Text>
+                    <HStack spacing={2}>
+                      <Text fontWeight="semibold">{convLabel(c)}</Text>
+                      {c.unread > 0 && c.conversation_id !== active && (
+                        <Badge colorScheme="red" rounded="full">{c.unread}</Badge>
+                      )}
+                    </HStack>
                     <Text fontSize="xs" color={mutedTextSm}>{fmtTime(c.timestamp)}</Text>
                   </HStack>
                   <Text fontSize="sm" color={mutedText} noOfLines={1}>{c.last_message}</Text>
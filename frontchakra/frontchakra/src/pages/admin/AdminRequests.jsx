@@ -7,13 +7,15 @@ import { api } from "../../api";
 export default function AdminRequests() {
   const toast = useToast();
   const [pending, setPending] = useState([]);
+  const [next, setNext] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  async function load() {
+  async function load({ more = false } = {}) {
     setLoading(true);
     try {
-      const data = await api.adminPending();
-      setPending(data.pending || []);
+      const data = await api.adminPending(more ? next : "");
+      setPending(prev => more ? [...prev, ...(data.pending || [])] : (data.pending || []));
+      setNext(data.next || null);
     } catch (e) {
       toast({ status: "error", title: e.message });
     } finally { setLoading(false); }
@@ -21,11 +23,11 @@ export default function AdminRequests() {
   useEffect(() => { load(); }, []);
 
   const approve = async (id) => {
-    try { await api.adminApprove(id); await load(); toast({ status: "success", title: "Aprobat" }); }
+    try { await api.adminApprove(id); setPending(p => p.filter(x => x.id !== id)); toast({ status: "success", title: "Aprobat" }); }
     catch (e) { toast({ status: "error", title: e.message }); }
   };
   const reject = async (id) => {
-    try { await api.adminReject(id); await load(); toast({ status: "success", title: "Respins" }); }
+    try { await api.adminReject(id); setPending(p => p.filter(x => x.id !== id)); toast({ status: "success", title: "Respins" }); }
     catch (e) { toast({ status: "error", title: e.message }); }
   };
 
@@ -62,6 +64,11 @@ export default function AdminRequests() {
           )}
         </Tbody>
       </Table>
+      {next && (
+        <Button mt={3} size="sm" onClick={() => load({ more: true })} isLoading={loading}>
+          Incarca mai multe
+        </Button>
+      )}
     </Box>
   );
 }
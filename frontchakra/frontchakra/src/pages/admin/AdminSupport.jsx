@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import {
   Badge, Box, Button, Heading, HStack, Input, Select, Table, Tbody, Td, Th, Thead, Tr,
   useToast, useDisclosure, Modal, ModalOverlay, ModalContent, ModalHeader, ModalBody, ModalFooter,
@@ -18,8 +18,10 @@ export default function AdminSupport() {
   const nav = useNavigate();
   const [rows, setRows] = useState([]);
   const [loading, setLoading] = useState(false);
-  const [resolvedFilter, setResolvedFilter] = useState(""); // "", "true", "false"
+  const [statusFilter, setStatusFilter] = useState(""); // "", "open", "resolved"
   const [q, setQ] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [counts, setCounts] = useState({});
 
   const panelBg   = useColorModeValue("white", "gray.800");
   const borderCol = useColorModeValue("gray.200", "gray.700");
@@ -50,36 +52,42 @@ export default function AdminSupport() {
 
   
 
-  const load = async () => {
+  // server-side: status filter, text search, newest-first pages
+  const load = async ({ more = false } = {}) => {
     setLoading(true);
     try {
-      const data = await api.adminSupportList(
-        resolvedFilter ? { resolved: resolvedFilter } : {}
-      );
-      setRows(data.items || []);
+      const params = {};
+      if (statusFilter) params.status = statusFilter;
+      if (q.trim()) params.q = q.trim();
+      if (more && nextCursor) params.before = nextCursor;
+      const data = await api.adminSupportList(params);
+      setRows(prev => more ? [...prev, ...(data.items || [])] : (data.items || []));
+      setNextCursor(data.next || null);
     } catch (e) {
       toast({ status: "error", title: e.message || "Failed to load support messages" });
     } finally {
       setLoading(false);
     }
   };
-  useEffect(() => { load(); /* eslint-disable-next-line */ }, [resolvedFilter]);
-
-  const filtered = useMemo(() => {
-    const s = q.trim().toLowerCase();
-    if (!s) return rows;
-    return rows.filter(r =>
-      (r.email || "").toLowerCase().includes(s) ||
-      (r.message || "").toLowerCase().includes(s)
-    );
-  }, [rows, q]);
+  const loadCounts = async () => {
+    try { setCounts(await api.adminSupportCounts()); } catch { /* badges only */ }
+  };
+  useEffect(() => {
+    const t = setTimeout(() => load(), 300); // debounce typing
+    return () => clearTimeout(t);
+    /* eslint-disable-next-line */
+  }, [statusFilter, q]);
+  useEffect(() => { loadCounts(); }, []);
 
   const toggleResolved = async (item, next) => {
     try {
       await api.adminSupportSetResolved(item.id, next);
       toast({ status: "success", title: next ? "Marcat ca rezolvat" : "Marcat ca nerezolvat" });
       if (openItem) setOpenItem({ ...openItem, resolved: next });
-      await load();
+      setRows(prev => prev
+        .map(r => (r.id === item.id ? { ...r, resolved: next, status: next ? "resolved" : "open" } : r))
+        .filter(r => !statusFilter || r.status === statusFilter));
+      loadCounts();
     } catch (e) {
       toast({ status: "error", title: e.message });
     }
@@ -97,13 +105,13 @@ export default function AdminSupport() {
         <Spacer />
         <Select
           maxW="180px"
-          value={resolvedFilter}
-          onChange={(e)=>setResolvedFilter(e.target.value)}
+          value={statusFilter}
+          onChange={(e)=>setStatusFilter(e.target.value)}
           title="Filter by status"
         >
-          <option value="">Toate</option>
-          <option value="false">Nerezolvate</option>
-          <option value="true">Rezolvate</option>
+          <option value="">Toate{counts.total != null ? ` (${counts.total})` : ""}</option>
+          <option value="open">Nerezolvate{counts.open != null ? ` (${counts.open})` : ""}</option>
+          <option value="resolved">Rezolvate{counts.resolved != null ? ` (${counts.resolved})` : ""}</option>
         </Select>
         <Input
           maxW="320px"
@@ -111,7 +119,7 @@ export default function AdminSupport() {
           value={q}
           onChange={(e)=>setQ(e.target.value)}
         />
-        <Button onClick={load} isLoading={loading}>Refresh</Button>
+        <Button onClick={() => { load(); loadCounts(); }} isLoading={loading}>Refresh</Button>
       </HStack>
 
       <Box bg={panelBg} border="1px" borderColor={borderCol} rounded="md" overflow="hidden">
@@ -126,7 +134,7 @@ export default function AdminSupport() {
             </Tr>
           </Thead>
           <Tbody>
-            {filtered.map((r) => (
+            {rows.map((r) => (
               <Tr key={r.id}>
                 <Td>{fmt(r.created_at)}</Td>
                 <Td>{r.email || (r.user_id ? "(logged-in user)" : "—")}</Td>
@@ -158,12 +166,17 @@ export default function AdminSupport() {
                 </Td>
               </Tr>
             ))}
-            {!loading && filtered.length === 0 && (
+            {!loading && rows.length === 0 && (
               <Tr><Td colSpan={5}><Text py={2} color={mutedText}>No messages.</Text></Td></Tr>
             )}
           </Tbody>
         </Table>
       </Box>
+      {nextCursor && (
+        <Button mt={3} size="sm" onClick={() => load({ more: true })} isLoading={loading}>
+          Incarca mai multe
+        </Button>
+      )}
 
       {/* View modal */}
       <Modal isOpen={dlg.isOpen} onClose={dlg.onClose} isCentered>
@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import {
   Box, Heading, Input, Table, Thead, Tbody, Tr, Th, Td,
   Button, HStack, useToast, useDisclosure, Modal, ModalOverlay, ModalContent,
@@ -10,6 +10,8 @@ import { api } from "../../api";
 export default function AdminUsers() {
   const toast = useToast();
   const [users, setUsers] = useState([]);
+  const [next, setNext] = useState(null);
+  const [counts, setCounts] = useState({});
   const [q, setQ] = useState("");
   const [loading, setLoading] = useState(false);
 
@@ -35,35 +37,30 @@ export default function AdminUsers() {
   }
 };
 
-  const load = async () => {
+  // server-side pages: non-admins only, prefix search on name/email
+  const load = async ({ more = false } = {}) => {
     setLoading(true);
     try {
-      const data = await api.adminUsers();
-      setUsers(data.users || []);
+      const data = await api.adminUsers({ role: "medic", q: q.trim(), after: more ? next : "" });
+      setUsers(prev => more ? [...prev, ...(data.users || [])] : (data.users || []));
+      setNext(data.next || null);
     } catch (e) {
       toast({ status: "error", title: e.message || "Failed to load users" });
     } finally {
       setLoading(false);
     }
   };
-  useEffect(() => { load(); }, []);
-
-  // 1) Hide admins
-  const nonAdmins = useMemo(
-    () => (users || []).filter(u => (u.global_role || "medic").toLowerCase() !== "admin"),
-    [users]
-  );
+  const loadCounts = async () => {
+    try { setCounts((await api.adminUserCounts()).status || {}); } catch { /* badges only */ }
+  };
+  useEffect(() => {
+    const t = setTimeout(() => load(), 250); // debounce typing
+    return () => clearTimeout(t);
+  }, [q]);
+  useEffect(() => { loadCounts(); }, []);
 
-  // 2) Filter by first/last/email
-  const filtered = useMemo(() => {
-    const s = q.trim().toLowerCase();
-    if (!s) return nonAdmins;
-    return nonAdmins.filter(u =>
-      (u.first_name || "").toLowerCase().includes(s) ||
-      (u.last_name  || "").toLowerCase().includes(s) ||
-      (u.email      || "").toLowerCase().includes(s)
-    );
-  }, [q, nonAdmins]);
+  const patchUser = (id, patch) =>
+    setUsers(prev => prev.map(u => (u.id === id ? { ...u, ...patch } : u)));
 
   const openEmail = (u) => { setSelected(u); setNewEmail(u.email || ""); emailDlg.onOpen(); };
   const openPass  = (u) => { setSelected(u); setNewPass(""); passDlg.onOpen(); };
@@ -75,7 +72,7 @@ export default function AdminUsers() {
       await api.adminUserUpdateEmail(selected.id, newEmail.trim());
       toast({ status: "success", title: "Email actualizat" });
       emailDlg.onClose();
-      await load();
+      patchUser(selected.id, { email: newEmail.trim().toLowerCase() });
     } catch (e) { toast({ status: "error", title: e.message }); }
     finally { setSaving(false); }
   };
@@ -97,13 +94,15 @@ export default function AdminUsers() {
     try {
       if (u.status === "approved") {
         await api.adminReject(u.id);
+        patchUser(u.id, { status: "rejected" });
         toast({ status: "info", title: "Utilizator respins" });
       } else {
         // treat pending or rejected as Approve
         await api.adminApprove(u.id);
+        patchUser(u.id, { status: "approved" });
         toast({ status: "success", title: "Utilizator aprobat" });
       }
-      await load();
+      loadCounts();
     } catch (e) {
       toast({ status: "error", title: e.message });
     }
@@ -115,7 +114,8 @@ export default function AdminUsers() {
     try {
       await api.adminUserDelete(u.id);
       toast({ status: "success", title: "Cont sters" });
-      await load();
+      setUsers(prev => prev.filter(x => x.id !== u.id));
+      loadCounts();
     } catch (e) { toast({ status: "error", title: e.message }); }
     finally { setSaving(false); }
   };
@@ -124,6 +124,7 @@ export default function AdminUsers() {
     <Box>
       <HStack mb={3} spacing={3}>
         <Heading size="md">Admin • Utilizatori</Heading>
+        {counts.pending > 0 && <Badge colorScheme="yellow">{counts.pending} in asteptare</Badge>}
         <Spacer />
         <Input
           maxW="320px"
@@ -145,7 +146,7 @@ export default function AdminUsers() {
             </Tr>
           </Thead>
           <Tbody>
-            {filtered.map(u => (
+            {users.map(u => (
               <Tr key={u.id}>
                 <Td>{u.first_name || "—"}</Td>
                 <Td>{u.last_name || "—"}</Td>
@@ -175,12 +176,17 @@ export default function AdminUsers() {
                 </Td>
               </Tr>
             ))}
-            {!loading && filtered.length === 0 && (
+            {!loading && users.length === 0 && (
               <Tr><Td colSpan={5}>No users match your filter.</Td></Tr>
             )}
           </Tbody>
         </Table>
       </Box>
+      {next && (
+        <Button mt={3} size="sm" onClick={() => load({ more: true })} isLoading={loading}>
+          Incarca mai multi
+        </Button>
+      )}
 
       {/* Change Email */}
       <Modal isOpen={emailDlg.isOpen} onClose={emailDlg.onClose} isCentered>
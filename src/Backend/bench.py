@@ -0,0 +1,368 @@
+"""
+Load-test / benchmark harness for register.py.
+
+Seeds a synthetic dataset (N centers, M medics, Y years of shifts and messages) and
+drives the hot endpoints concurrently through the Flask test client, reporting latency
+percentiles and throughput per endpoint.
+
+    # local mongod, throwaway database: --db is required, must end in _bench and is emptied when seeding
+    MONGO_URI=mongodb://localhost:27017 python bench.py --db emergency_center_bench --centers 5 --medics 80 --years 2
+
+    python bench.py ... --save-baseline     # write bench_baseline.json
+    python bench.py ... --compare           # exit 1 if p50/p99 regressed past --tolerance
+
+Requests go through the WSGI stack in-process (decorators, Mongo round-trips, bcrypt),
+no HTTP server or network, so numbers measure the app and the database only.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import click
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+PASSWORD = "bench-pass"
+SEED_BATCH = 5000
+
+
+def _load_app(db_name: str):
+    """Import register on db_name with the background workers off."""
+    os.environ.setdefault("NOTIFY_WORKER", "0")
+    os.environ.setdefault("MESSAGE_STREAM_BACKEND", "local")
+    os.environ["MONGO_DB"] = db_name  # never whatever MONGO_DB the shell happens to export
+    import register
+    register.create_app()  # indexes (and nothing else: workers are off above)
+    return register
+
+
+# --- Synthetic data ---
+def seed(reg, n_centers, n_medics, years, messages_per_medic, rnd):
+    """Empty the bench database and fill it; returns the ids the scenarios need."""
+    if not reg.db.name.endswith("_bench"):
+        raise click.ClickException(f"refusing to empty {reg.db.name!r}: bench databases end in _bench")
+    for name in reg.db.list_collection_names():
+        reg.db[name].delete_many({})  # keep the indexes create_app() just built
+
+    pw_hash = reg.bcrypt.hashpw(PASSWORD.encode("utf-8"), reg.bcrypt.gensalt(reg.BCRYPT_ROUNDS))  # once: every user shares it
+    admin_id = reg.users.insert_one({
+        "first_name": "Bench", "last_name": "Admin", "email": "admin@bench.local",
+        "password_hash": pw_hash, "status": "approved", "global_role": "admin",
+    }).inserted_id
+    medic_ids = reg.users.insert_many([
+        {"first_name": f"Medic{i}", "last_name": "Bench", "email": f"medic{i}@bench.local",
+         "password_hash": pw_hash, "status": "approved", "global_role": "medic"}
+        for i in range(n_medics)
+    ]).inserted_ids
+    center_ids = reg.centers.insert_many([
+        {"name": f"Centru {i}", "location": f"Oras {i}"} for i in range(n_centers)
+    ]).inserted_ids
+
+    # every medic in one center (the first n_centers lead theirs), ~20% in a second one
+    members = {cid: [] for cid in center_ids}
+    rows = []
+    for i, mid in enumerate(medic_ids):
+        home = center_ids[i % n_centers]
+        centers_of = [home]
+        if n_centers > 1 and rnd.random() < 0.2:
+            centers_of.append(rnd.choice([c for c in center_ids if c != home]))
+        for cid in centers_of:
+            members[cid].append(mid)
+            rows.append({"center_id": cid, "user_id": mid, "role": "lead" if i < n_centers and cid == home else "medic"})
+    reg.memberships.insert_many(rows)
+    leads = {center_ids[i]: medic_ids[i] for i in range(min(n_centers, n_medics))}
+
+    # shifts: one medic per center per day for the past `years`, no double booking
+    today = date.today()
+    day, added, docs = today - timedelta(days=365 * years), [], []
+    while day < today:
+        dstr = day.strftime(reg.DATE_FMT)
+        taken = set()
+        for cid in center_ids:
+            free = [m for m in members[cid] if m not in taken]
+            if not free:
+                continue
+            mid = rnd.choice(free)
+            taken.add(mid)
+            docs.append({"center_id": cid, "date": dstr, "medic_id": mid,
+                         "created_at": datetime.utcnow(), "assigned_by": admin_id})
+            added.append((cid, dstr, mid))
+        if len(docs) >= SEED_BATCH:
+            reg.shifts.insert_many(docs)
+            reg._shift_stats_apply(added)
+            docs, added = [], []
+        day += timedelta(days=1)
+    if docs:
+        reg.shifts.insert_many(docs)
+        reg._shift_stats_apply(added)
+
+    # busy days in the next three months, so auto-fill has something to route around
+    busy = {(mid, (today + timedelta(days=rnd.randint(1, 90))).strftime(reg.DATE_FMT))
+            for mid in medic_ids for _ in range(3)}
+    if busy:
+        reg.busy_days.insert_many([{"medic_id": m, "date": d, "created_at": datetime.utcnow()} for m, d in busy])
+
+    # DMs between colleagues, spread over the same period
+    span = int(timedelta(days=365 * years).total_seconds())
+    start = datetime.utcnow() - timedelta(seconds=span)
+    msgs = []
+    for i, mid in enumerate(medic_ids):
+        peers = [p for p in members[center_ids[i % n_centers]] if p != mid] or [admin_id]
+        for _ in range(messages_per_medic):
+            to = rnd.choice(peers)
+            msgs.append({
+                "conversation_id": reg.dm_conversation_id(str(mid), str(to)),
+                "from": str(mid), "to": to, "content": f"bench {rnd.random():.6f}",
+                "timestamp": start + timedelta(seconds=rnd.randrange(span)), "system": False,
+            })
+    msgs.sort(key=lambda m: m["timestamp"])
+    for k in range(0, len(msgs), SEED_BATCH):
+        batch = msgs[k:k + SEED_BATCH]
+        reg.messages.insert_many(batch)
+        reg._update_conversation_summaries(batch)
+
+    reg.availability.invalidate()
+    return {
+        "admin_id": admin_id, "medic_ids": medic_ids, "center_ids": center_ids,
+        "members": members, "leads": leads,
+        "shifts": reg.shifts.count_documents({}), "messages": len(msgs),
+    }
+
+
+# --- Scenarios ---
+def _timed(label, call, *args, **kwargs):
+    t0 = time.perf_counter()
+    r = call(*args, **kwargs)
+    return r, (label, r.status_code, (time.perf_counter() - t0) * 1000)
+
+def _months_back(n):
+    d = date.today().replace(day=1)
+    for _ in range(n):
+        d = (d - timedelta(days=1)).replace(day=1)
+    return d.strftime("%Y-%m")
+
+def _months_ahead(n):
+    d = date.today().replace(day=1)
+    for _ in range(n):
+        d = (d + timedelta(days=32)).replace(day=1)
+    return d.strftime("%Y-%m")
+
+
+def build_scenarios(reg, data, years, rnd):
+    """name -> callable(client, i) returning [(endpoint label, status, ms)] for the calls it made."""
+    with reg.app.app_context():
+        tokens = {mid: reg._issue_token(str(mid)) for mid in data["medic_ids"]}
+        admin_token = reg._issue_token(str(data["admin_id"]))
+    hdr = lambda mid: {"Authorization": f"Bearer {tokens[mid]}"}
+    medics = data["medic_ids"]
+    leads = [(cid, mid) for cid, mid in data["leads"].items()]
+    member_of = {}
+    for cid, mids in data["members"].items():
+        for mid in mids:
+            member_of.setdefault(mid, cid)
+    months = max(1, 12 * years)
+
+    def login(client, i):
+        email = f"medic{rnd.randrange(len(medics))}@bench.local"
+        _, rec = _timed("POST /login", client.post, "/login", json={"email": email, "password": PASSWORD})
+        return [rec]
+
+    def inbox_poll(client, i):
+        # what Inbox.jsx does every second: list conversations, then the open thread
+        mid = rnd.choice(medics)
+        r, rec = _timed("GET /conversations", client.get, "/conversations", headers=hdr(mid))
+        out = [rec]
+        convs = (r.get_json() or {}).get("conversations") or []
+        if convs:
+            cid = convs[0]["conversation_id"]
+            _, rec = _timed("GET /messages/<cid>", client.get, f"/messages/{cid}?limit=50", headers=hdr(mid))
+            out.append(rec)
+        return out
+
+    def schedule_view(client, i):
+        mid = rnd.choice(medics)
+        month = _months_back(rnd.randrange(months))
+        _, rec = _timed("GET /centers/<id>/schedule", client.get,
+                        f"/centers/{member_of[mid]}/schedule?month={month}", headers=hdr(mid))
+        out = [rec]
+        _, rec = _timed("GET /my/schedule", client.get, f"/my/schedule?month={month}", headers=hdr(mid))
+        out.append(rec)
+        return out
+
+    def availability_view(client, i):
+        cid, lead = rnd.choice(leads)
+        month = _months_ahead(1 + rnd.randrange(3))
+        _, rec = _timed("GET /centers/<id>/availability", client.get,
+                        f"/centers/{cid}/availability?month={month}", headers=hdr(lead))
+        return [rec]
+
+    storm = [(cid, lead, _months_ahead(k)) for k in range(1, 61) for cid, lead in leads]
+    storm_lock = threading.Lock()
+
+    def auto_fill(client, i):
+        # every call fills a fresh (center, future month); concurrent calls race on the unique indexes
+        with storm_lock:
+            if not storm:
+                return []
+            cid, lead, month = storm.pop(0)
+        _, rec = _timed("POST /centers/<id>/schedule/auto", client.post,
+                        f"/centers/{cid}/schedule/auto?month={month}", headers=hdr(lead))
+        return [rec]
+
+    def admin_reports(client, i):
+        _, rec = _timed("GET /admin/reports", client.get, f"/admin/reports?from={_months_back(months - 1)}&to={_months_back(0)}",
+                        headers={"Authorization": f"Bearer {admin_token}"})
+        return [rec]
+
+    return {
+        "login": login,
+        "inbox_poll": inbox_poll,
+        "schedule_view": schedule_view,
+        "availability": availability_view,
+        "auto_fill": auto_fill,
+        "admin_reports": admin_reports,
+    }
+
+
+# --- Runner ---
+def _percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+def run_scenario(reg, fn, n_requests, concurrency):
+    """Run fn n_requests times over `concurrency` threads; per endpoint latency stats in ms."""
+    samples, lock, local = {}, threading.Lock(), threading.local()
+
+    def one(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = reg.app.test_client()
+        results = fn(client, i)
+        with lock:
+            for label, status, elapsed in results:
+                s = samples.setdefault(label, {"ms": [], "errors": 0})
+                s["ms"].append(elapsed)
+                s["errors"] += status >= 400
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - t0
+
+    out = {}
+    for label, s in samples.items():
+        ms = sorted(s["ms"])
+        out[label] = {
+            "count": len(ms), "errors": s["errors"], "rps": round(len(ms) / wall, 1),
+            "mean": round(sum(ms) / len(ms), 2),
+            "p50": round(_percentile(ms, 50), 2), "p90": round(_percentile(ms, 90), 2),
+            "p99": round(_percentile(ms, 99), 2), "max": round(ms[-1], 2),
+        }
+    return out
+
+
+def compare(results, baseline, tolerance):
+    """[(endpoint, metric, base, now)] for every p50/p99 that got worse than baseline * (1 + tolerance)."""
+    worse = []
+    for label, now in results.items():
+        base = baseline.get(label)
+        if not base:
+            continue
+        for metric in ("p50", "p99"):
+            if base[metric] > 0 and now[metric] > base[metric] * (1 + tolerance):
+                worse.append((label, metric, base[metric], now[metric]))
+    return worse
+
+
+@click.command()
+@click.option("--db", "db_name", required=True, help="Database to run on; must end in _bench (seeding empties it).")
+@click.option("--centers", default=5, show_default=True)
+@click.option("--medics", default=60, show_default=True)
+@click.option("--years", default=2, show_default=True)
+@click.option("--messages", "messages_per_medic", default=100, show_default=True, help="DMs sent per medic.")
+@click.option("--no-seed", is_flag=True, help="Reuse the data seeded by a previous run.")
+@click.option("--scenario", "only", multiple=True, help="Run only these scenarios (repeatable).")
+@click.option("--requests", "n_requests", default=200, show_default=True, help="Calls per scenario.")
+@click.option("--concurrency", default=8, show_default=True)
+@click.option("--seed-value", default=1, show_default=True, help="RNG seed, keeps datasets reproducible.")
+@click.option("--save-baseline", is_flag=True, help=f"Write results to {os.path.basename(BASELINE_PATH)}.")
+@click.option("--compare", "do_compare", is_flag=True, help="Compare against the stored baseline.")
+@click.option("--tolerance", default=0.25, show_default=True, help="Allowed p50/p99 slowdown for --compare.")
+def main(db_name, centers, medics, years, messages_per_medic, no_seed, only, n_requests,
+         concurrency, seed_value, save_baseline, do_compare, tolerance):
+    if not db_name.endswith("_bench"):
+        raise click.BadParameter("must end in _bench", param_hint="--db")
+    rnd = random.Random(seed_value)
+    reg = _load_app(db_name)
+    params = {"centers": centers, "medics": medics, "years": years, "messages": messages_per_medic,
+              "requests": n_requests, "concurrency": concurrency}
+
+    t0 = time.perf_counter()
+    if no_seed:
+        data = _existing_data(reg)
+    else:
+        data = seed(reg, centers, medics, years, messages_per_medic, rnd)
+    click.echo(f"dataset: {len(data['center_ids'])} centers, {len(data['medic_ids'])} medics, "
+               f"{data['shifts']} shifts, {data['messages']} messages ({time.perf_counter() - t0:.1f}s)")
+
+    scenarios = build_scenarios(reg, data, years, rnd)
+    results = {}
+    for name, fn in scenarios.items():
+        if only and name not in only:
+            continue
+        results.update(run_scenario(reg, fn, n_requests, concurrency))
+
+    click.echo(f"{'endpoint':36} {'count':>6} {'err':>4} {'rps':>8} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for label, r in results.items():
+        click.echo(f"{label:36} {r['count']:>6} {r['errors']:>4} {r['rps']:>8} {r['mean']:>8} "
+                   f"{r['p50']:>8} {r['p90']:>8} {r['p99']:>8} {r['max']:>8}")
+
+    if save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "created_at": datetime.utcnow().isoformat() + "Z", "results": results},
+                      f, indent=2, sort_keys=True)
+        click.echo(f"baseline written to {BASELINE_PATH}")
+
+    if do_compare:
+        try:
+            with open(BASELINE_PATH, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            raise click.ClickException("no baseline yet, run with --save-baseline first")
+        if baseline["params"] != params:
+            click.echo(f"warning: baseline was recorded with {baseline['params']}")
+        worse = compare(results, baseline["results"], tolerance)
+        for label, metric, base, now in worse:
+            click.echo(f"REGRESSION {label} {metric}: {base}ms -> {now}ms")
+        if worse:
+            sys.exit(1)
+        click.echo("no regressions against baseline")
+
+
+def _existing_data(reg):
+    """Rebuild the scenario inputs from a database seeded by an earlier run."""
+    admin = reg.users.find_one({"email": "admin@bench.local"})
+    if not admin:
+        raise click.ClickException("no bench data found, run once without --no-seed")
+    medic_ids = [u["_id"] for u in reg.users.find({"email": {"$regex": r"^medic\d+@bench\.local$"}}).sort("_id", 1)]
+    center_ids = [c["_id"] for c in reg.centers.find({}, {"_id": 1}).sort("_id", 1)]
+    members, leads = {cid: [] for cid in center_ids}, {}
+    for m in reg.memberships.find({}):
+        members.setdefault(m["center_id"], []).append(m["user_id"])
+        if m["role"] == "lead":
+            leads[m["center_id"]] = m["user_id"]
+    return {
+        "admin_id": admin["_id"], "medic_ids": medic_ids, "center_ids": center_ids,
+        "members": members, "leads": leads,
+        "shifts": reg.shifts.count_documents({}), "messages": reg.messages.count_documents({}),
+    }
+
+
+if __name__ == "__main__":
+    main()
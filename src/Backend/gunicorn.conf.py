@@ -0,0 +1,27 @@
+# gunicorn -c gunicorn.conf.py "register:create_app()"
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str((os.cpu_count() or 1) * 2 + 1)))
+# threads: Mongo and bcrypt release the GIL. An open /messages/stream also holds one, so
+# register.py caps streams per worker (STREAM_MAX_CONNECTIONS, keep it well under threads);
+# for many live clients route /messages/stream to the async service in gunicorn.stream.conf.py.
+# Live events: with the default MESSAGE_STREAM_BACKEND=local a stream only sees messages sent
+# through the same worker, so with workers > 1 most updates arrive via the Inbox's 15s poll.
+# Multi-worker deployments should set MESSAGE_STREAM_BACKEND=changestream (needs a replica set).
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+raw_env = [f"STREAM_MAX_CONNECTIONS={os.getenv('STREAM_MAX_CONNECTIONS', str(max(1, threads // 4)))}"]
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))  # > 0 recycles workers
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+# each worker imports register itself: its own MongoClient pool, caches and background threads
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+
+
+def worker_exit(server, worker):
+    import register
+    register.shutdown()
@@ -0,0 +1,25 @@
+# Dedicated SSE service for /messages/stream (route only that path here at the ingress):
+#   gunicorn -c gunicorn.stream.conf.py "register:create_app()"
+# gevent workers keep each idle stream down to a greenlet instead of a thread. Messages are
+# written by the API service, so this one must fan out from the change stream (replica set).
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gevent"
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "2000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "10"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+raw_env = [
+    "MESSAGE_STREAM_BACKEND=changestream",
+    "NOTIFY_WORKER=0",  # the API service delivers notifications
+    f"STREAM_MAX_CONNECTIONS={os.getenv('STREAM_MAX_CONNECTIONS', '1500')}",
+]
+
+
+def worker_exit(server, worker):
+    import register
+    register.shutdown()
@@ -1,15 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-from pymongo import MongoClient 
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from pymongo import MongoClient, InsertOne, UpdateOne, UpdateMany, ReturnDocument, monitoring
+from pymongo import timeout as mongo_timeout
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 import bcrypt
 from datetime import timedelta as td
 from datetime import timedelta
 import os
+import atexit
+import time
+import json
+import queue
+import threading
+import hashlib
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeout
+import multiprocessing
+from collections import OrderedDict
 from bson import ObjectId
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from datetime import datetime as dt
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from io import StringIO
 import csv
 from flask import make_response
@@ -17,6 +29,17 @@ from flask import make_response
 
 
 import calendar
+import itertools
+import functools
+import click
+import logging
+
+try:  # optional: only needed once shifts are archived (flask archive-shifts)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pq = pc = None
 
 # --- App Setup ---
 app = Flask(__name__)
@@ -25,35 +48,245 @@ CORS(app)
 # --- JWT CONFIG ---
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "dev-secret-change-me")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=7)
+app.config["JWT_TOKEN_LOCATION"] = ["headers"]
 jwt = JWTManager(app)
+# EventSource can't send headers: /messages/stream takes ?jwt=<ticket> instead, where the
+# ticket is a short-lived token from POST /messages/stream/ticket, valid for nothing else.
+STREAM_TICKET_TTL = int(os.getenv("STREAM_TICKET_TTL", "60"))  # seconds to open the stream
+
+@jwt.token_verification_loader
+def _stream_ticket_scope(jwt_header, jwt_data):
+    return jwt_data.get("scope") != "stream" or request.endpoint == "message_stream"
+
+# --- Metrics ---
+# Per-route latency histograms plus Mongo commands/round trips/server time per request,
+# exposed Prometheus-style at /metrics (only with METRICS_TOKEN set) and, if SERVER_TIMING
+# is on, per response as a Server-Timing header (it shows DB time and query counts to clients).
+# Counters are per process: scrape every worker (or sum them) behind a multi-worker server.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # /metrics wants "Authorization: Bearer <token>"; unset: 404
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # > 0: log Mongo commands slower than this, with their shape
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+slow_query_log = logging.getLogger("register.slow_queries")
+
+_metrics_lock = threading.Lock()
+_route_latency = {}   # (method, route) -> {"buckets": [n per bucket], "sum": s, "count": n}
+_route_status = {}    # (method, route, status) -> n
+_route_mongo = {}     # (method, route) -> {"commands": n, "seconds": s}
+_mongo_commands = {}  # (command, collection) -> {"count": n, "failed": n, "seconds": s}
+_request_stats = threading.local()  # current request's Mongo tally, set in before_request
+
+def _query_shape(value, depth=0):
+    """Keys and operators of a filter/pipeline with every literal replaced by "?"."""
+    if depth > 6:
+        return "..."
+    if isinstance(value, dict):
+        return {k: _query_shape(v, depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [_query_shape(v, depth + 1) for v in value[:20]]
+        return shapes if any(isinstance(v, (dict, list)) for v in shapes) else ["?"]
+    return "?"
+
+def _command_shape(event):
+    cmd = event.command
+    name = event.command_name
+    if name == "aggregate":
+        return {"pipeline": _query_shape(cmd.get("pipeline", []))}
+    if name in ("find", "count", "distinct", "findAndModify"):
+        return {"filter": _query_shape(cmd.get("filter", cmd.get("query", {})))}
+    if name in ("update", "delete"):
+        return {"q": [_query_shape(op.get("q", {})) for op in (cmd.get(name + "s") or [])[:5]]}
+    return {}
+
+class _MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}  # (connection, request_id) -> (collection, shape) while a command is in flight
+
+    def started(self, event):
+        coll = event.command.get(event.command_name)
+        coll = coll if isinstance(coll, str) else ""
+        shape = _command_shape(event) if SLOW_QUERY_MS > 0 else None
+        self._pending[(event.connection_id, event.request_id)] = (coll, shape)
+
+    def _finished(self, event, failed):
+        coll, shape = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1e6
+        with _metrics_lock:
+            m = _mongo_commands.setdefault((event.command_name, coll), {"count": 0, "failed": 0, "seconds": 0.0})
+            m["count"] += 1
+            m["failed"] += failed
+            m["seconds"] += seconds
+        stats = getattr(_request_stats, "current", None)
+        if stats is not None:  # commands from background threads have no request to charge
+            stats["commands"] += 1
+            stats["seconds"] += seconds
+        if SLOW_QUERY_MS > 0 and seconds * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning("slow mongo %s %s %.1fms shape=%s", event.command_name, coll,
+                                   seconds * 1000, json.dumps(shape, default=str))
+
+    def succeeded(self, event):
+        self._finished(event, 0)
+
+    def failed(self, event):
+        self._finished(event, 1)
+
+def _metrics_start():
+    g.metrics_t0 = time.perf_counter()
+    _request_stats.current = {"commands": 0, "seconds": 0.0}
+
+def _metrics_finish(resp):
+    stats = getattr(_request_stats, "current", None)
+    _request_stats.current = None
+    t0 = g.pop("metrics_t0", None)
+    if t0 is None or stats is None:
+        return resp
+    elapsed = time.perf_counter() - t0
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"  # templated: no ids in labels
+    key = (request.method, route)
+    with _metrics_lock:
+        h = _route_latency.setdefault(key, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+        for i, le in enumerate(LATENCY_BUCKETS):
+            if elapsed <= le:
+                h["buckets"][i] += 1
+        h["sum"] += elapsed
+        h["count"] += 1
+        _route_status[key + (resp.status_code,)] = _route_status.get(key + (resp.status_code,), 0) + 1
+        rm = _route_mongo.setdefault(key, {"commands": 0, "seconds": 0.0})
+        rm["commands"] += stats["commands"]
+        rm["seconds"] += stats["seconds"]
+    if SERVER_TIMING:  # streamed bodies (SSE, exports) are timed up to the first byte
+        resp.headers.add("Server-Timing", f"app;dur={elapsed * 1000:.1f}")
+        resp.headers.add("Server-Timing", f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["commands"]} queries"')
+    return resp
+
+if METRICS_ENABLED:
+    app.before_request(_metrics_start)
+    app.after_request(_metrics_finish)
+
+def _prom_labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+def _render_metrics() -> str:
+    lines = []
+    with _metrics_lock:
+        lines += ["# HELP http_request_duration_seconds Request latency by route.",
+                  "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), h in sorted(_route_latency.items()):
+            for le, n in zip(LATENCY_BUCKETS, h["buckets"]):
+                lines.append(f"http_request_duration_seconds_bucket{_prom_labels(method=method, route=route, le=le)} {n}")
+            lines.append(f"http_request_duration_seconds_bucket{_prom_labels(method=method, route=route, le='+Inf')} {h['count']}")
+            lines.append(f"http_request_duration_seconds_sum{_prom_labels(method=method, route=route)} {h['sum']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{_prom_labels(method=method, route=route)} {h['count']}")
+        lines += ["# HELP http_requests_total Responses by route and status.", "# TYPE http_requests_total counter"]
+        for (method, route, status), n in sorted(_route_status.items()):
+            lines.append(f"http_requests_total{_prom_labels(method=method, route=route, status=status)} {n}")
+        lines += ["# HELP http_request_mongo_commands_total Mongo round trips made while serving a route.",
+                  "# TYPE http_request_mongo_commands_total counter"]
+        for (method, route), rm in sorted(_route_mongo.items()):
+            lines.append(f"http_request_mongo_commands_total{_prom_labels(method=method, route=route)} {rm['commands']}")
+        lines += ["# HELP http_request_mongo_seconds_total Mongo time spent while serving a route.",
+                  "# TYPE http_request_mongo_seconds_total counter"]
+        for (method, route), rm in sorted(_route_mongo.items()):
+            lines.append(f"http_request_mongo_seconds_total{_prom_labels(method=method, route=route)} {rm['seconds']:.6f}")
+        lines += ["# HELP mongo_commands_total Mongo commands by name and collection.", "# TYPE mongo_commands_total counter"]
+        for (name, coll), m in sorted(_mongo_commands.items()):
+            lines.append(f"mongo_commands_total{_prom_labels(command=name, collection=coll)} {m['count']}")
+        lines += ["# HELP mongo_command_failures_total Failed Mongo commands.", "# TYPE mongo_command_failures_total counter"]
+        for (name, coll), m in sorted(_mongo_commands.items()):
+            lines.append(f"mongo_command_failures_total{_prom_labels(command=name, collection=coll)} {m['failed']}")
+        lines += ["# HELP mongo_command_seconds_total Server round-trip time by command.", "# TYPE mongo_command_seconds_total counter"]
+        for (name, coll), m in sorted(_mongo_commands.items()):
+            lines.append(f"mongo_command_seconds_total{_prom_labels(command=name, collection=coll)} {m['seconds']:.6f}")
+        lines += ["# HELP password_hash_seconds bcrypt time by operation (queue wait excluded).",
+                  "# TYPE password_hash_seconds histogram"]
+        for op, h in sorted(_hash_latency.items()):
+            for le, n in zip(LATENCY_BUCKETS, h["buckets"]):
+                lines.append(f"password_hash_seconds_bucket{_prom_labels(op=op, le=le)} {n}")
+            lines.append(f"password_hash_seconds_bucket{_prom_labels(op=op, le='+Inf')} {h['count']}")
+            lines.append(f"password_hash_seconds_sum{_prom_labels(op=op)} {h['sum']:.6f}")
+            lines.append(f"password_hash_seconds_count{_prom_labels(op=op)} {h['count']}")
+        lines += ["# HELP password_hash_rejected_total Hash jobs refused with 429 because the queue was full.",
+                  "# TYPE password_hash_rejected_total counter",
+                  f"password_hash_rejected_total {_hash_rejected['count']}"]
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_TOKEN:
+        return {"error": "Not found"}, 404
+    if request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return {"error": "Neautorizat"}, 401
+    return Response(_render_metrics(), mimetype="text/plain; version=0.0.4")
 
 # --- Mongo Setup ---
-client = MongoClient("")
-db = client["emergency_center"]
+# Pool and timeouts come from the environment (unset: driver default). connect=False keeps
+# the client idle until first use, so nothing is opened before a server forks its workers.
+_MONGO_OPTIONS = {  # env var -> MongoClient option (integers)
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+}
+_mongo_kwargs = {opt: int(os.environ[env]) for env, opt in _MONGO_OPTIONS.items() if os.getenv(env)}
+if os.getenv("MONGO_READ_PREFERENCE"):  # primary, primaryPreferred, secondaryPreferred, ...
+    _mongo_kwargs["readPreference"] = os.environ["MONGO_READ_PREFERENCE"]
+client = MongoClient(
+    os.getenv("MONGO_URI", ""),
+    connect=False,
+    appname=os.getenv("MONGO_APPNAME", "emergency-center-api"),
+    event_listeners=[_MongoCommandListener()] if METRICS_ENABLED else [],
+    **_mongo_kwargs,
+)
+db = client[os.getenv("MONGO_DB", "emergency_center")]
 users = db["users"]               
 centers = db["centers"]         
 memberships = db["memberships"]  
 shifts = db["shifts"]            
 messages = db["messages"]        
+conversations = db["conversations"]  # per-participant inbox summary, maintained on message insert
+read_markers = db["read_markers"]    # per-participant last-read timestamp per conversation
+notification_outbox = db["notification_outbox"]  # pending shift-assignment notifications
+shift_stats = db["shift_stats"]      # rollup: shifts per (center_id, month "YYYY-MM", medic_id)
 support = db["support"]
+busy_days = db["busy_days"]
 
 
 # Indexes
-support.create_index([("resolved", 1), ("created_at", 1)])
-support.create_index([("status", 1)])
-users.create_index("email", unique=True)
-memberships.create_index([("center_id", 1), ("user_id", 1)], unique=True)
-shifts.create_index([("center_id", 1), ("date", 1)], unique=True)  # 1 medic per day per center
-messages.create_index([("to", 1), ("conversation_id", 1), ("timestamp", 1)])
-shifts.create_index([("date", 1), ("medic_id", 1)], unique=True)  # prevent cross-center double booking per day
-shifts.create_index([("medic_id", 1), ("date", 1)])  # speeds up /my/schedule
-memberships.create_index(
-    [("user_id", 1), ("role", 1)],  
-    unique=True,
-    partialFilterExpression={"role": "lead"}  # only enforce uniqueness for role=lead
-)
-busy_days = db["busy_days"]
-busy_days.create_index([("medic_id", 1), ("date", 1)], unique=True)   # uniqueness
+def ensure_indexes():
+    """Create the indexes the queries rely on (idempotent); run once per process at startup."""
+    _migrate_support_status()  # legacy `resolved` flags, before the queue filters on status
+    support.create_index([("status", 1), ("_id", -1)])  # admin queue: ?status= pages, newest first
+    support.create_index([("created_at", 1)])           # exports by date range
+    support.create_index([("message", "text"), ("email", "text")], name="support_text")  # ?q= search
+    users.create_index("email", unique=True)
+    users.create_index([("status", 1), ("_id", 1)])         # /admin/users?status=, /admin/pending
+    users.create_index([("global_role", 1), ("_id", 1)])    # /admin/users?role=
+    users.create_index([("search_terms", 1), ("_id", 1)])   # /admin/users?q= prefix search
+    users.create_index([("status", 1), ("search_terms", 1)])  # /users/search typeahead (approved only)
+    memberships.create_index([("center_id", 1), ("user_id", 1)], unique=True)
+    shifts.create_index([("center_id", 1), ("date", 1)], unique=True)  # 1 medic per day per center
+    messages.create_index([("to", 1), ("conversation_id", 1), ("timestamp", 1)])
+    messages.create_index([("conversation_id", 1), ("timestamp", 1), ("_id", 1)])  # thread reads: since/before cursors
+    conversations.create_index([("participant", 1), ("conversation_id", 1)], unique=True)
+    conversations.create_index([("participant", 1), ("timestamp", -1), ("conversation_id", -1)])  # inbox listing, ?since=
+    read_markers.create_index([("participant", 1), ("conversation_id", 1)], unique=True)
+    notification_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+    notification_outbox.create_index([("claimed_by", 1)])
+    shift_stats.create_index([("center_id", 1), ("month", 1), ("medic_id", 1)], unique=True)
+    shift_stats.create_index([("month", 1), ("center_id", 1)])  # cross-center /admin/reports
+    shift_stats.create_index([("medic_id", 1)])
+    shifts.create_index([("date", 1), ("medic_id", 1)], unique=True)  # prevent cross-center double booking per day
+    shifts.create_index([("medic_id", 1), ("date", 1)])  # speeds up /my/schedule
+    memberships.create_index(
+        [("user_id", 1), ("role", 1)],  
+        unique=True,
+        partialFilterExpression={"role": "lead"}  # only enforce uniqueness for role=lead
+    )
+    busy_days.create_index([("medic_id", 1), ("date", 1)], unique=True)   # uniqueness
 
 
 
@@ -88,13 +321,136 @@ def _month_bounds(month_str: str):
     
 
 
-def _get_current_user():
-    """Fetch the user document for the current JWT subject, or None."""
+# --- Auth cache ---
+# Every protected route needs the caller's global role/status and, for center routes,
+# their membership. _auth_info() loads both once and memoizes them on flask.g for the
+# request; with USER_CACHE_TTL > 0 they are also kept process-wide for that many seconds.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "0"))  # 0 disables the process-wide cache
+_auth_cache = {}  # user_id (str) -> (expires_at, info)
+
+# Opt-in: embed role/status/center roles in the access token so the decorators can
+# authorize without touching Mongo. users.auth_version is bumped on every role or
+# membership change; tokens carrying an older version fall back to a DB lookup
+# (and can be swapped for a fresh one via POST /token/refresh).
+JWT_ROLE_CLAIMS = os.getenv("JWT_ROLE_CLAIMS", "0").lower() in ("1", "true", "yes")
+AUTH_VERSION_TTL = float(os.getenv("AUTH_VERSION_TTL", "30"))  # how long a process trusts a known version
+_auth_versions = {}  # user_id (str) -> (expires_at, auth_version)
+
+def _load_auth_info(user_id: str):
     try:
-        uid = get_jwt_identity()
-        return users.find_one({"_id": ObjectId(uid)})
+        oid = ObjectId(user_id)
     except Exception:
         return None
+    u = users.find_one({"_id": oid}, {"global_role": 1, "status": 1, "auth_version": 1})
+    if not u:
+        return None
+    _auth_versions[user_id] = (time.monotonic() + AUTH_VERSION_TTL, u.get("auth_version", 0))
+    return {
+        "id": user_id,
+        "global_role": u.get("global_role", "medic"),
+        "status": u.get("status", "pending"),
+        "auth_version": u.get("auth_version", 0),
+        # center_id (str) -> "medic" | "lead"
+        "centers": {
+            str(m["center_id"]): m.get("role", "medic")
+            for m in memberships.find({"user_id": oid}, {"_id": 0, "center_id": 1, "role": 1})
+        },
+    }
+
+def _auth_info(user_id=None):
+    """Role/status/memberships for user_id (default: JWT subject), or None if the user doesn't exist."""
+    user_id = str(user_id or get_jwt_identity())
+    per_request = g.setdefault("auth_info", {})
+    if user_id in per_request:
+        return per_request[user_id]
+
+    info = None
+    if JWT_ROLE_CLAIMS and user_id == str(get_jwt_identity()):
+        info = _auth_info_from_claims(user_id)
+    if info is None and USER_CACHE_TTL > 0:
+        hit = _auth_cache.get(user_id)
+        if hit and hit[0] > time.monotonic():
+            info = hit[1]
+    if info is None:
+        info = _load_auth_info(user_id)
+        if info is not None and USER_CACHE_TTL > 0:
+            _auth_cache[user_id] = (time.monotonic() + USER_CACHE_TTL, info)
+
+    per_request[user_id] = info
+    return info
+
+def _auth_version(user_id: str):
+    """Current users.auth_version (cached for AUTH_VERSION_TTL), or None if the user is gone."""
+    hit = _auth_versions.get(user_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    u = users.find_one({"_id": ObjectId(user_id)}, {"auth_version": 1})
+    if not u:
+        return None
+    version = u.get("auth_version", 0)
+    _auth_versions[user_id] = (time.monotonic() + AUTH_VERSION_TTL, version)
+    return version
+
+def _role_claims(info) -> dict:
+    # compact: centers map to "l"/"m"
+    return {
+        "role": info["global_role"],
+        "st": info["status"],
+        "ctr": {cid: ("l" if role == "lead" else "m") for cid, role in info["centers"].items()},
+        "av": info["auth_version"],
+    }
+
+def _auth_info_from_claims(user_id: str):
+    """Auth info straight from the JWT, or None if the token has no claims or they are outdated."""
+    claims = get_jwt()
+    if "av" not in claims or claims["av"] != _auth_version(user_id):
+        return None
+    return {
+        "id": user_id,
+        "global_role": claims.get("role", "medic"),
+        "status": claims.get("st", "pending"),
+        "auth_version": claims["av"],
+        "centers": {cid: ("lead" if r == "l" else "medic") for cid, r in claims.get("ctr", {}).items()},
+    }
+
+def _issue_token(user_id: str, info=None) -> str:
+    claims = None
+    if JWT_ROLE_CLAIMS:
+        info = info or _load_auth_info(user_id)
+        claims = _role_claims(info) if info else None
+    return create_access_token(identity=user_id, additional_claims=claims)
+
+def _invalidate_auth_cache(*user_ids):
+    """Drop cached auth info for the given users (all users if none given)."""
+    if not user_ids:
+        _auth_cache.clear()
+        _auth_versions.clear()
+    for uid in user_ids:
+        _auth_cache.pop(str(uid), None)
+        _auth_versions.pop(str(uid), None)
+    g.pop("auth_info", None)
+
+def _auth_changed(*user_ids):
+    """Role/status/membership of these users changed: bump their auth_version and drop caches."""
+    oids = [ObjectId(u) for u in user_ids]
+    if oids:
+        users.update_many({"_id": {"$in": oids}}, {"$inc": {"auth_version": 1}})
+    _invalidate_auth_cache(*user_ids)
+
+def _center_role(info, center_id):
+    """Caller's role in center_id ("medic"/"lead"), or None if not a member."""
+    if not info:
+        return None
+    return info["centers"].get(str(ObjectId(center_id)))
+
+def _get_current_user():
+    """Fetch the user document for the current JWT subject, or None (memoized per request)."""
+    if "current_user" not in g:
+        try:
+            g.current_user = users.find_one({"_id": ObjectId(get_jwt_identity())})
+        except Exception:
+            g.current_user = None
+    return g.current_user
 
 def admin_required(fn):
     """Decorator: require a valid JWT AND user.global_role == 'admin'."""
@@ -102,7 +458,7 @@ def admin_required(fn):
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        me = _get_current_user()
+        me = _auth_info()
         if not me:
             return jsonify({"error": "Neautorizat"}), 401
         if me.get("global_role") != "admin":
@@ -117,16 +473,94 @@ def require_member_or_admin(fn):
     @wraps(fn)
     @jwt_required()
     def wrapper(center_id, *args, **kwargs):
-        me_id = get_jwt_identity()
-        me = users.find_one({"_id": ObjectId(me_id)})
+        me = _auth_info()
         if me and me.get("global_role") == "admin":
             return fn(center_id, *args, **kwargs)
-        m = db.memberships.find_one({"center_id": ObjectId(center_id), "user_id": ObjectId(me_id)})
-        if not m:
+        if not _center_role(me, center_id):
             return jsonify({"error": "Neautorizat (members only)"}), 403
         return fn(center_id, *args, **kwargs)
     return wrapper
 
+# --- Password hashing ---
+# bcrypt runs on a small dedicated pool (it releases the GIL) so a login storm queues
+# there instead of tying up every request thread. Past BCRYPT_QUEUE_MAX waiting jobs
+# callers get 429 right away, which keeps the cheap endpoints responsive.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # changing it rehashes users on their next login
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_QUEUE_MAX = int(os.getenv("BCRYPT_QUEUE_MAX", str(BCRYPT_WORKERS * 8)))
+BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))  # seconds a request waits for its hash
+
+_hash_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_QUEUE_MAX)  # running + queued
+_hash_latency = {}  # op -> {"buckets", "sum", "count"} (time spent hashing, queue wait excluded)
+_hash_rejected = {"count": 0}
+
+class HashingBusy(Exception):
+    pass
+
+@app.errorhandler(HashingBusy)
+def _hashing_busy(e):
+    resp = jsonify({"error": "Prea multe cereri, incercati din nou"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 429
+
+def _observe_hash(op, seconds):
+    with _metrics_lock:
+        h = _hash_latency.setdefault(op, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+        for i, le in enumerate(LATENCY_BUCKETS):
+            if seconds <= le:
+                h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+def _hash_job(op, fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        with _metrics_lock:
+            _hash_rejected["count"] += 1
+        raise HashingBusy()
+
+    def run():
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            _observe_hash(op, time.perf_counter() - t0)
+
+    fut = _hash_pool.submit(run)
+    fut.add_done_callback(lambda _: _hash_slots.release())
+    return fut
+
+def hash_password(password: bytes) -> bytes:
+    try:
+        return _hash_job("hash", bcrypt.hashpw, password, bcrypt.gensalt(BCRYPT_ROUNDS)).result(BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        raise HashingBusy()
+
+def check_password(password: bytes, hashed) -> bool:
+    try:
+        return _hash_job("check", bcrypt.checkpw, password, hashed).result(BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        raise HashingBusy()
+
+def _hash_rounds(hashed) -> int:
+    # "$2b$12$..." -> 12
+    try:
+        return int(bytes(hashed)[4:6])
+    except (TypeError, ValueError):
+        return 0
+
+def _rehash_if_needed(user_id, password: bytes, hashed):
+    """After a successful login: rehash at BCRYPT_ROUNDS in the background, best effort."""
+    if _hash_rounds(hashed) == BCRYPT_ROUNDS:
+        return
+    def store(fut):
+        if fut.exception() is None:  # only replace the hash we checked against
+            users.update_one({"_id": user_id, "password_hash": hashed}, {"$set": {"password_hash": fut.result()}})
+    try:
+        _hash_job("rehash", bcrypt.hashpw, password, bcrypt.gensalt(BCRYPT_ROUNDS)).add_done_callback(store)
+    except HashingBusy:
+        pass  # busy: try again on a later login
+
 @app.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
@@ -149,7 +583,7 @@ def register():
         return jsonify({"error": "Email deja inregistrat"}), 400
 
     # --- Hash Password ---
-    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    hashed_pw = hash_password(password.encode("utf-8"))
 
     # --- Insert User ---
     new_user = {
@@ -159,9 +593,11 @@ def register():
         "email": email,
         "password_hash": hashed_pw,
         "status": "pending",   # requires admin approval
-        "global_role": "medic" # default role
+        "global_role": "medic", # default role
+        "search_terms": _search_terms(first_name, last_name, email),
     }
     users.insert_one(new_user)
+    _user_counts_changed()
 
     return jsonify({"message": "Registration successful, awaiting approval"})
 
@@ -179,14 +615,15 @@ def login():
         return jsonify({"error": "Email sau parola incorecte"}), 401
 
     # Check password
-    if not bcrypt.checkpw(password.encode("utf-8"), user["password_hash"]):
+    if not check_password(password.encode("utf-8"), user["password_hash"]):
         return jsonify({"error": "Email sau parola incorecte"}), 401
 
     # Optional gate: block login until approved
     if user.get("status") != "approved":
         return jsonify({"error": "Contul nu a fost aprobat"}), 403
 
-    access_token = create_access_token(identity=str(user["_id"]))
+    _rehash_if_needed(user["_id"], password.encode("utf-8"), user["password_hash"])
+    access_token = _issue_token(str(user["_id"]))
 
     return jsonify({
         "access_token": access_token,
@@ -202,6 +639,19 @@ def login():
     })
 
 
+@app.post("/token/refresh")
+@jwt_required()
+def refresh_token():
+    # re-issue the access token with up-to-date role claims
+    user_id = str(get_jwt_identity())
+    info = _load_auth_info(user_id)
+    if not info:
+        return jsonify({"error": "Neautorizat"}), 401
+    if info["status"] != "approved":
+        return jsonify({"error": "Contul nu a fost aprobat"}), 403
+    return jsonify({"access_token": _issue_token(user_id, info)})
+
+
 @app.get("/me")
 @jwt_required()
 def me():
@@ -227,11 +677,79 @@ def me():
     })
 
 # ---------------- ADMIN: LIST PENDING ----------------
+# --- Admin user lists ---
+# Keyset pages ordered by _id (?after=<last id>), filtered server-side. Prefix search runs on
+# users.search_terms: normalized first/last name, email and both name orders, kept up to date
+# wherever those fields change (backfill older users with `flask backfill-search-terms`).
+ADMIN_USERS_PAGE = 50
+ADMIN_USERS_PAGE_MAX = 200
+ADMIN_COUNTS_TTL = float(os.getenv("ADMIN_COUNTS_TTL", "10"))
+_user_counts = {"at": 0.0, "body": None}
+
+def _search_norm(value) -> str:
+    # "Ștefan " -> "stefan": lower case, no diacritics, single spaces
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+def _search_terms(first_name, last_name, email) -> list:
+    first, last, mail = _search_norm(first_name), _search_norm(last_name), _search_norm(email)
+    terms = [first, last, mail, f"{first} {last}".strip(), f"{last} {first}".strip()]
+    return sorted({t for t in terms if t})
+
+def _refresh_search_terms(user_oid):
+    u = users.find_one({"_id": user_oid}, {"first_name": 1, "last_name": 1, "email": 1})
+    if u:
+        users.update_one({"_id": user_oid}, {"$set": {
+            "search_terms": _search_terms(u.get("first_name"), u.get("last_name"), u.get("email"))
+        }})
+
+def _user_counts_changed():
+    _user_counts["body"] = None
+
+def _admin_user_page(q: dict):
+    """Apply ?after/?limit to q; returns (docs, next cursor) or raises ValueError."""
+    after = request.args.get("after")
+    if after:
+        if not ObjectId.is_valid(after):
+            raise ValueError("Invalid after cursor")
+        q["_id"] = {"$gt": ObjectId(after)}
+    try:
+        limit = min(max(int(request.args.get("limit", ADMIN_USERS_PAGE)), 1), ADMIN_USERS_PAGE_MAX)
+    except ValueError:
+        raise ValueError("limit must be a number")
+    docs = list(users.find(q, {"password": 0, "password_hash": 0, "search_terms": 0}).sort("_id", 1).limit(limit + 1))
+    nxt = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return docs[:limit], nxt
+
 @app.get("/admin/users")
 @admin_required
 def list_users():
+    """
+    ?status=pending|approved|rejected &role=medic|admin &center_id=<id> &q=<prefix of name/email>
+    &after=<cursor> &limit=N  -> {"users": [...], "next": cursor or null}
+    """
+    q = {}
+    if request.args.get("status"):
+        q["status"] = request.args["status"]
+    if request.args.get("role"):
+        q["global_role"] = request.args["role"]
+    term = _search_norm(request.args.get("q"))
+    if term:
+        q["search_terms"] = {"$regex": "^" + re.escape(term)}
+    center_id = request.args.get("center_id")
+    if center_id:
+        if not ObjectId.is_valid(center_id):
+            return {"error": "Invalid center_id"}, 400
+        q.setdefault("$and", []).append(
+            {"_id": {"$in": memberships.find({"center_id": ObjectId(center_id)}).distinct("user_id")}}
+        )
+    try:
+        page, nxt = _admin_user_page(q)
+    except ValueError as e:
+        return {"error": str(e)}, 400
     docs = []
-    for u in users.find({}, {"password": 0, "password_hash": 0}):
+    for u in page:
         docs.append({
             "id": str(u["_id"]), 
             #"username": u.get("username"),
@@ -240,21 +758,56 @@ def list_users():
             "email": u.get("email"), "status": u.get("status"),
             "global_role": u.get("global_role", "medic")
         })
-    return {"users": docs}
-    
+    return {"users": docs, "next": nxt}
 
+@app.get("/admin/users/counts")
+@admin_required
+def user_counts():
+    # badge counts, one $facet pass, cached briefly (dropped on register/approve/reject/delete)
+    if _user_counts["body"] is None or time.monotonic() - _user_counts["at"] > ADMIN_COUNTS_TTL:
+        res = next(users.aggregate([{"$facet": {
+            "status": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+            "role": [{"$group": {"_id": {"$ifNull": ["$global_role", "medic"]}, "n": {"$sum": 1}}}],
+        }}]))
+        status = {r["_id"] or "pending": r["n"] for r in res["status"]}
+        _user_counts["body"] = {
+            "total": sum(status.values()),
+            "status": status,
+            "role": {r["_id"]: r["n"] for r in res["role"]},
+        }
+        _user_counts["at"] = time.monotonic()
+    return _user_counts["body"]
 
 @app.get("/admin/pending")
 @admin_required
 def list_pending():
+    try:
+        page, nxt = _admin_user_page({"status": "pending"})
+    except ValueError as e:
+        return {"error": str(e)}, 400
     docs = []
-    for u in users.find({"status": "pending"}):
+    for u in page:
         docs.append({"id": str(u["_id"]), 
         "first_name": u.get("first_name"),
         "last_name": u.get("last_name"),
         #"username": u.get("username"),
         "email": u.get("email")})
-    return jsonify({"pending": docs})
+    return jsonify({"pending": docs, "next": nxt})
+
+@app.cli.command("backfill-search-terms")
+def backfill_search_terms_command():
+    """Fill users.search_terms for accounts created before prefix search existed."""
+    ops, n = [], 0
+    for u in users.find({}, {"first_name": 1, "last_name": 1, "email": 1}):
+        ops.append(UpdateOne({"_id": u["_id"]}, {"$set": {
+            "search_terms": _search_terms(u.get("first_name"), u.get("last_name"), u.get("email"))
+        }}))
+        if len(ops) >= 1000:
+            n += users.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        n += users.bulk_write(ops, ordered=False).modified_count
+    print(f"search_terms updated: {n} users")
 
 @app.patch("/admin/approve/<user_id>")
 @admin_required
@@ -262,6 +815,8 @@ def approve_user(user_id):
     res = users.update_one({"_id": ObjectId(user_id)}, {"$set": {"status": "approved"}})
     if res.matched_count == 0:
         return jsonify({"error": "User nu a fost gasit"}), 404
+    _auth_changed(user_id)
+    _user_counts_changed()
     return jsonify({"message": "User aprobat"})
 
 @app.patch("/admin/reject/<user_id>")
@@ -270,6 +825,8 @@ def reject_user(user_id):
     res = users.update_one({"_id": ObjectId(user_id)}, {"$set": {"status": "rejected"}})
     if res.matched_count == 0:
         return jsonify({"error": "User nu a fost gasit"}), 404
+    _auth_changed(user_id)
+    _user_counts_changed()
     return jsonify({"message": "User respins"})
 
 
@@ -286,11 +843,13 @@ def create_center():
 @app.get("/centers")
 @jwt_required()
 def list_centers():
-    me = users.find_one({"_id": ObjectId(get_jwt_identity())})
+    me = _auth_info()
+    if not me:
+        return {"error": "Neautorizat"}, 401
     if me.get("global_role") == "admin":
         centers = list(db.centers.find())
     else:
-        cids = db.memberships.find({"user_id": me["_id"]}).distinct("center_id")
+        cids = [ObjectId(c) for c in me["centers"]]
         centers = list(db.centers.find({"_id": {"$in": cids}}))
     for c in centers: c["_id"] = str(c["_id"])
     return {"centers": centers}
@@ -305,8 +864,11 @@ def update_center(center_id):
 @app.delete("/centers/<center_id>")
 @admin_required
 def delete_center(center_id):
+    member_ids = db.memberships.find({"center_id": ObjectId(center_id)}).distinct("user_id")
     db.centers.delete_one({"_id": ObjectId(center_id)})
     db.memberships.delete_many({"center_id": ObjectId(center_id)})
+    _auth_changed(*member_ids)
+    _contacts_changed(center_id)
     return {"message":"deleted"}
 
 #memberships
@@ -316,13 +878,11 @@ def require_lead_or_admin(fn):
     @wraps(fn)
     @jwt_required()
     def wrapper(center_id, *args, **kwargs):
-        me_id = get_jwt_identity()
-        me = users.find_one({"_id": ObjectId(me_id)})
+        me = _auth_info()
         if me and me.get("global_role") == "admin":  # admins always allowed
             return fn(center_id, *args, **kwargs)
         # otherwise must be lead of that center
-        m = db.memberships.find_one({"center_id": ObjectId(center_id), "user_id": ObjectId(me_id), "role":"lead"})
-        if not m:
+        if _center_role(me, center_id) != "lead":
             return {"error":"Neautorizat (doar coordonator)"}, 403
         return fn(center_id, *args, **kwargs)
     return wrapper
@@ -372,6 +932,8 @@ def add_member(center_id):
         "user_id": user_oid,
         "role": "medic"
     })
+    _auth_changed(uid)
+    _contacts_changed(center_oid)
     return {"message": "medic adaugat"}, 201
 
 
@@ -392,6 +954,7 @@ def assign_lead(center_id):
     if existing_elsewhere:
         return {"error": "Medicul este deja coordonator al altui centru"}, 409
 
+    previous_leads = db.memberships.find({"center_id": center_oid, "role": "lead"}).distinct("user_id")
     try:
         # Demote any current lead(s) in THIS center only
         db.memberships.update_many({"center_id": center_oid, "role":"lead"}, {"$set":{"role":"medic"}})
@@ -405,6 +968,9 @@ def assign_lead(center_id):
     except DuplicateKeyError:
         # Unique partial index (user_id, role=lead) tripped — somebody else holds them as lead
         return {"error": "Medicul este deja coordonator al altui centru"}, 409
+    finally:
+        _auth_changed(user_oid, *previous_leads)
+        _contacts_changed(center_oid)
 
     return {"message":"lead assigned"}
 
@@ -418,34 +984,792 @@ def remove_member(center_id, user_id):
     res = db.memberships.delete_one({"center_id": center_oid, "user_id": user_oid})
     if res.deleted_count == 0:
         return {"error": "not found"}, 404
+    _auth_changed(user_id)
+    _contacts_changed(center_oid)
 
     # 2. remove FUTURE shifts for this user at this center
     today_str = date.today().strftime(DATE_FMT)
-    deleted = db.shifts.delete_many({
+    future = {
         "center_id": center_oid,
         "medic_id": user_oid,
         "date": {"$gt": today_str}   # strictly in the future
-    })
+    }
+    future_dates = db.shifts.find(future, {"_id": 0, "date": 1}).distinct("date")
+    deleted = db.shifts.delete_many(future)
+    if deleted.deleted_count:
+        _schedule_changed(center_oid)
+        _shifts_changed(removed=[(center_oid, d, user_oid) for d in future_dates])
 
     return {
         "message": "member removed",
         "future_shifts_removed": deleted.deleted_count
     }
 
+# --- Contacts directory ---
+# GET /me/contacts: everyone sharing a center with the caller (admins: every member) in one
+# aggregation, cached per user. An entry remembers the generation of each center it was built
+# from; _contacts_changed(center) bumps that center (and the "*" generation admins depend on),
+# so membership writes and profile edits only rebuild the directories that saw them.
+# Per process: other workers catch up within CONTACTS_CACHE_TTL.
+CONTACTS_CACHE_TTL = float(os.getenv("CONTACTS_CACHE_TTL", "60"))
+CONTACTS_CACHE_SIZE = int(os.getenv("CONTACTS_CACHE_SIZE", "2048"))
+_contacts_cache = OrderedDict()  # user_id (str) -> {"at", "gens", "etag", "body"}
+_contacts_gens = {"*": 0}        # center_id (str) | "*" -> generation
+_contacts_lock = threading.Lock()
+
+def _contacts_changed(*center_ids):
+    """Members of these centers changed (or one of them edited their profile)."""
+    with _contacts_lock:
+        _contacts_gens["*"] += 1
+        for cid in center_ids:
+            cid = str(cid)
+            _contacts_gens[cid] = _contacts_gens.get(cid, 0) + 1
+
+def _contacts_changed_for_user(user_oid):
+    _contacts_changed(*memberships.find({"user_id": user_oid}).distinct("center_id"))
+
+def _build_contacts(center_oids):
+    """center_oids None = every center (admin view)."""
+    pipeline = [] if center_oids is None else [{"$match": {"center_id": {"$in": center_oids}}}]
+    pipeline += [
+        {"$group": {"_id": "$user_id", "centers": {"$push": {"k": {"$toString": "$center_id"}, "v": "$role"}}}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "u",
+        }},
+        {"$unwind": "$u"},
+        {"$project": {
+            "_id": 0,
+            "id": {"$toString": "$_id"},
+            "first_name": "$u.first_name",
+            "last_name": "$u.last_name",
+            "email": "$u.email",
+            "phone": "$u.phone",
+            "centers": {"$arrayToObject": "$centers"},  # center_id -> role
+        }},
+        {"$sort": {"last_name": 1, "first_name": 1, "id": 1}},
+    ]
+    contacts = list(memberships.aggregate(pipeline))
+    cq = {} if center_oids is None else {"_id": {"$in": center_oids}}
+    center_list = [{"_id": str(c["_id"]), "name": c.get("name"), "location": c.get("location")}
+                   for c in centers.find(cq, {"name": 1, "location": 1}).sort("name", 1)]
+    return {"centers": center_list, "contacts": contacts}
+
+@app.get("/me/contacts")
+@jwt_required()
+def my_contacts():
+    me = _auth_info()
+    if not me:
+        return {"error": "Neautorizat"}, 401
+    is_admin = me.get("global_role") == "admin"
+    center_ids = sorted(me["centers"])
+    with _contacts_lock:
+        gens = {"*": _contacts_gens["*"]} if is_admin else {c: _contacts_gens.get(c, 0) for c in center_ids}
+        cached = _contacts_cache.get(me["id"])
+        if cached and cached["gens"] == gens and time.monotonic() - cached["at"] < CONTACTS_CACHE_TTL:
+            _contacts_cache.move_to_end(me["id"])
+        else:
+            cached = None
+    if cached is None:
+        body = _build_contacts(None if is_admin else [ObjectId(c) for c in center_ids])
+        cached = {"at": time.monotonic(), "gens": gens, "etag": _etag(body), "body": body}
+        with _contacts_lock:
+            _contacts_cache[me["id"]] = cached
+            _contacts_cache.move_to_end(me["id"])
+            while len(_contacts_cache) > CONTACTS_CACHE_SIZE:
+                _contacts_cache.popitem(last=False)
+
+    resp = jsonify(cached["body"])
+    resp.set_etag(cached["etag"])
+    return resp.make_conditional(request)
+
 
 #messages
 
-def _send_system_assignment_message(medic_id: str, center_name: str, date_str: str):
+def _system_assignment_message(medic_id: str, assignments) -> dict:
+    """System message for one medic; assignments is [(center_name, date_str), ...] sorted by date."""
+    if len(assignments) == 1:
+        center_name, date_str = assignments[0]
+        content = f"Ai fost programat in data de {date_str} la {center_name}."
+    else:
+        days = ", ".join(f"{date_str} la {center_name}" for center_name, date_str in assignments)
+        content = f"Ai fost programat in urmatoarele zile: {days}."
     # One system thread per user
-    msg = {
+    return {
         "conversation_id": f"system_{medic_id}",
         "from": "system",
         "to": ObjectId(medic_id),
-        "content": f"Ai fost programat in data de {date_str} la {center_name}.",
+        "content": content,
         "timestamp": dt.utcnow(),
         "system": True
     }
-    messages.insert_one(msg)
+
+# --- Live message fan-out (used by GET /messages/stream) ---
+# "local": send paths publish straight into this process' subscriber queues; only right with
+#          a single worker process (others' messages reach clients through their ?since= poll).
+# "changestream": a watcher thread tails messages inserts instead, so every worker/pod
+#                 sees every message (needs a replica set).
+MESSAGE_STREAM_BACKEND = os.getenv("MESSAGE_STREAM_BACKEND", "local")
+STREAM_KEEPALIVE = 15          # seconds between SSE comments on idle streams
+# An open stream holds a server thread under threaded workers: cap them per process so idle
+# streams can't starve the API (over the cap: 503, the Inbox falls back to polling).
+# A dedicated async stream service (gunicorn.stream.conf.py) raises this.
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", "4"))  # 0 = no cap
+_stream_count = {"open": 0}
+STREAM_QUEUE_SIZE = 100        # per-subscriber backlog; a slow client loses events, not memory
+_subscribers = {}              # user_id (str) -> set of queue.Queue
+_subscribers_lock = threading.Lock()
+
+def _subscribe(user_id: str) -> queue.Queue:
+    q = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    with _subscribers_lock:
+        _subscribers.setdefault(user_id, set()).add(q)
+    return q
+
+def _unsubscribe(user_id: str, q: queue.Queue):
+    with _subscribers_lock:
+        subs = _subscribers.get(user_id)
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del _subscribers[user_id]
+
+def _message_event(msg: dict) -> dict:
+    ts = msg.get("timestamp")
+    ts = ts.isoformat() + "Z" if ts else None
+    return {
+        "type": "message",
+        "message": {
+            "_id": str(msg["_id"]) if msg.get("_id") else None,
+            "conversation_id": msg["conversation_id"],
+            "from": msg["from"],
+            "to": str(msg["to"]),
+            "content": msg["content"],
+            "timestamp": ts,
+            "system": bool(msg.get("system")),
+        },
+        # conversation summary delta, same shape as GET /conversations items
+        "conversation": {
+            "conversation_id": msg["conversation_id"],
+            "last_message": msg["content"],
+            "timestamp": ts,
+        },
+    }
+
+def _fan_out(msg: dict):
+    event = _message_event(msg)
+    participants = {str(msg["to"])}
+    if msg.get("from") and msg["from"] != "system":
+        participants.add(msg["from"])
+    with _subscribers_lock:
+        targets = [q for uid in participants for q in _subscribers.get(uid, ())]
+    for q in targets:
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            pass
+
+def _publish_message(*msgs):
+    """Call after inserting messages; no-op when the change stream watcher does the fan-out."""
+    if MESSAGE_STREAM_BACKEND != "local":
+        return
+    for msg in msgs:
+        _fan_out(msg)
+
+def _watch_message_inserts():
+    while True:
+        try:
+            with messages.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                for change in stream:
+                    _fan_out(change["fullDocument"])
+        except Exception:
+            time.sleep(1)  # primary stepdown / network blip: reopen the stream
+
+# --- Conversation summaries ---
+def _update_conversation_summaries(msgs):
+    """Upsert (participant, conversation_id) summaries and users.unread_total for freshly inserted messages."""
+    ops = []
+    unread_inc = {}  # recipient oid -> new unread messages
+    for msg in msgs:
+        unread_inc[msg["to"]] = unread_inc.get(msg["to"], 0) + 1
+        summary = {"last_message": msg["content"], "timestamp": msg["timestamp"]}
+        # recipient: one more unread message
+        ops.append(UpdateOne(
+            {"participant": msg["to"], "conversation_id": msg["conversation_id"]},
+            {"$set": summary, "$inc": {"unread": 1}},
+            upsert=True
+        ))
+        # sender (system has no inbox)
+        if msg.get("from") and msg["from"] != "system":
+            ops.append(UpdateOne(
+                {"participant": ObjectId(msg["from"]), "conversation_id": msg["conversation_id"]},
+                {"$set": summary, "$setOnInsert": {"unread": 0}},
+                upsert=True
+            ))
+    if ops:
+        conversations.bulk_write(ops, ordered=True)
+    if unread_inc:
+        users.bulk_write([
+            UpdateOne({"_id": uid}, {"$inc": {"unread_total": n}})
+            for uid, n in unread_inc.items()
+        ], ordered=False)
+
+def _messages_inserted(*msgs):
+    """Bookkeeping after inserting messages: inbox summaries + live fan-out."""
+    _update_conversation_summaries(msgs)
+    _publish_message(*msgs)
+
+def rebuild_conversation_summaries():
+    """Recompute conversations (and users.unread_total) from messages and read_markers."""
+    messages.aggregate([
+        {"$project": {
+            "conversation_id": 1,
+            "content": 1,
+            "timestamp": 1,
+            "participants": {"$cond": [
+                {"$eq": ["$from", "system"]},
+                ["$to"],
+                ["$to", {"$toObjectId": "$from"}]
+            ]},
+        }},
+        {"$unwind": "$participants"},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {"participant": "$participants", "conversation_id": "$conversation_id"},
+            "last_message": {"$last": "$content"},
+            "timestamp": {"$last": "$timestamp"},
+        }},
+        # unread = messages to the participant newer than their read marker
+        {"$lookup": {
+            "from": "read_markers",
+            "let": {"p": "$_id.participant", "c": "$_id.conversation_id"},
+            "pipeline": [{"$match": {"$expr": {"$and": [
+                {"$eq": ["$participant", "$$p"]}, {"$eq": ["$conversation_id", "$$c"]}
+            ]}}}],
+            "as": "rm",
+        }},
+        {"$set": {"last_read": {"$ifNull": [{"$arrayElemAt": ["$rm.last_read", 0]}, datetime(1970, 1, 1)]}}},
+        {"$lookup": {
+            "from": "messages",
+            "let": {"p": "$_id.participant", "c": "$_id.conversation_id", "lr": "$last_read"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$to", "$$p"]}, {"$eq": ["$conversation_id", "$$c"]}, {"$gt": ["$timestamp", "$$lr"]}
+                ]}}},
+                {"$count": "n"},
+            ],
+            "as": "u",
+        }},
+        {"$project": {
+            "_id": 0,
+            "participant": "$_id.participant",
+            "conversation_id": "$_id.conversation_id",
+            "last_message": 1,
+            "timestamp": 1,
+            "unread": {"$ifNull": [{"$arrayElemAt": ["$u.n", 0]}, 0]},
+        }},
+        {"$out": "conversations"},  # atomic swap, keeps the indexes above
+    ], allowDiskUse=True)
+
+    users.update_many({}, {"$set": {"unread_total": 0}})
+    conversations.aggregate([
+        {"$match": {"unread": {"$gt": 0}}},
+        {"$group": {"_id": "$participant", "unread_total": {"$sum": "$unread"}}},
+        {"$merge": {"into": "users", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ])
+    return conversations.count_documents({})
+
+@app.cli.command("rebuild-conversations")
+def rebuild_conversations_command():
+    """Backfill/rebuild conversation summaries: `flask --app register rebuild-conversations`."""
+    n = rebuild_conversation_summaries()
+    print(f"conversations rebuilt: {n} summaries")
+
+# --- Assignment notification outbox ---
+# Shift writes only drop a row in notification_outbox; a worker thread picks rows up after
+# NOTIFY_DELAY seconds (so a planning burst lands in one digest per medic), sends them with
+# one insert_many and retries failures with backoff.
+NOTIFY_WORKER = os.getenv("NOTIFY_WORKER", "1").lower() in ("1", "true", "yes")  # 0: run `flask notify-worker` separately
+NOTIFY_DELAY = float(os.getenv("NOTIFY_DELAY", "5"))     # seconds to wait for more assignments to coalesce
+NOTIFY_POLL_INTERVAL = 2.0
+NOTIFY_BATCH_SIZE = 500
+NOTIFY_MAX_ATTEMPTS = 5
+NOTIFY_CLAIM_TIMEOUT = timedelta(minutes=5)  # a crashed worker's claim is released after this
+_notify_wakeup = threading.Event()
+
+def _queue_assignment_notifications(center_oid, assignments):
+    """assignments: [(medic ObjectId, "YYYY-MM-DD"), ...] just written for center_oid."""
+    if not assignments:
+        return
+    now = dt.utcnow()
+    try:
+        notification_outbox.insert_many([{
+            "medic_id": medic_oid,
+            "center_id": center_oid,
+            "date": date_str,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now + td(seconds=NOTIFY_DELAY),
+        } for medic_oid, date_str in assignments])
+    except Exception:
+        # the shift itself is already saved; a lost notification must not fail the request
+        app.logger.exception("could not queue assignment notifications")
+    _notify_wakeup.set()
+
+def _deliver_notifications(rows):
+    names = {
+        c["_id"]: c.get("name", "Center")
+        for c in centers.find({"_id": {"$in": list({r["center_id"] for r in rows})}}, {"name": 1})
+    }
+    per_medic = {}
+    for r in rows:
+        per_medic.setdefault(r["medic_id"], []).append((names.get(r["center_id"], "Center"), r["date"]))
+    msgs = [
+        _system_assignment_message(str(medic_oid), sorted(items, key=lambda it: it[1]))
+        for medic_oid, items in per_medic.items()
+    ]
+    messages.insert_many(msgs)
+    _messages_inserted(*msgs)
+
+def process_notification_outbox() -> int:
+    """Claim, send and clear one batch of due notifications. Returns how many rows were handled."""
+    now = dt.utcnow()
+    # release claims of workers that died mid-batch
+    notification_outbox.update_many(
+        {"status": "processing", "claimed_at": {"$lt": now - NOTIFY_CLAIM_TIMEOUT}},
+        {"$set": {"status": "pending"}, "$unset": {"claimed_by": ""}}
+    )
+
+    due = [d["_id"] for d in notification_outbox.find(
+        {"status": "pending", "next_attempt_at": {"$lte": now}}, {"_id": 1}
+    ).sort("next_attempt_at", 1).limit(NOTIFY_BATCH_SIZE)]
+    if not due:
+        return 0
+    token = ObjectId()
+    notification_outbox.update_many(
+        {"_id": {"$in": due}, "status": "pending"},  # another worker may have won some rows
+        {"$set": {"status": "processing", "claimed_by": token, "claimed_at": now}}
+    )
+    rows = list(notification_outbox.find({"claimed_by": token}))
+    if not rows:
+        return 0
+
+    try:
+        _deliver_notifications(rows)
+    except Exception:
+        app.logger.exception("notification delivery failed, will retry")
+        for r in rows:
+            attempts = r.get("attempts", 0) + 1
+            notification_outbox.update_one({"_id": r["_id"]}, {
+                "$set": {
+                    "status": "failed" if attempts >= NOTIFY_MAX_ATTEMPTS else "pending",
+                    "attempts": attempts,
+                    "next_attempt_at": now + td(seconds=2 ** attempts * 5),
+                },
+                "$unset": {"claimed_by": ""},
+            })
+        return len(rows)
+
+    notification_outbox.delete_many({"claimed_by": token})
+    return len(rows)
+
+def _notification_worker():
+    while True:
+        try:
+            if process_notification_outbox():
+                continue  # more may be due right away
+        except Exception:
+            app.logger.exception("notification worker error")
+        _notify_wakeup.wait(NOTIFY_POLL_INTERVAL)
+        _notify_wakeup.clear()
+
+@app.cli.command("notify-worker")
+def notify_worker_command():
+    """Run the notification outbox worker in the foreground (use with NOTIFY_WORKER=0 on the web workers)."""
+    _notification_worker()
+
+# --- Schedule cache ---
+# GET /centers/<id>/schedule responses keyed by (center_id, "YYYY-MM"), with an ETag.
+# In-process LRU by default; SCHEDULE_CACHE_URL=redis://... shares it between workers.
+# Invalidation only reaches the worker that handled the write, so local entries expire
+# after SCHEDULE_LOCAL_CACHE_TTL: with several workers that bounds how long a stale
+# month is served (use the shared backend when that's too long).
+# Every write that changes a month's schedule (or a name/email shown in it) must call
+# _schedule_changed / _schedule_changed_for_medic.
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "512"))
+SCHEDULE_CACHE_URL = os.getenv("SCHEDULE_CACHE_URL")
+SCHEDULE_CACHE_TTL = int(os.getenv("SCHEDULE_CACHE_TTL", "3600"))  # shared backend only
+SCHEDULE_LOCAL_CACHE_TTL = int(os.getenv("SCHEDULE_LOCAL_CACHE_TTL", "30"))
+
+class _LocalScheduleCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # (center_id, month) -> (expires_at, {"etag", "body"})
+        self._gens = {}              # center_id -> bumped on every invalidation
+        self._lock = threading.Lock()
+
+    def generation(self, center_id):
+        return self._gens.get(center_id, 0)
+
+    def get(self, center_id, month):
+        with self._lock:
+            v = self._data.get((center_id, month))
+            if v is None:
+                return None
+            if v[0] <= time.monotonic():
+                del self._data[(center_id, month)]
+                return None
+            self._data.move_to_end((center_id, month))
+            return v[1]
+
+    def set(self, center_id, month, value, generation):
+        with self._lock:
+            if self._gens.get(center_id, 0) != generation:
+                return  # a write landed while we were building this; don't cache stale data
+            self._data[(center_id, month)] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end((center_id, month))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, center_id, months=None):
+        with self._lock:
+            self._gens[center_id] = self._gens.get(center_id, 0) + 1
+            keys = [k for k in self._data if k[0] == center_id and (months is None or k[1] in months)]
+            for k in keys:
+                del self._data[k]
+
+class _RedisScheduleCache:
+    # one hash per center: field = month, value = JSON; staleness bounded by SCHEDULE_CACHE_TTL
+    def __init__(self, url, ttl):
+        import redis  # optional dependency, only needed with SCHEDULE_CACHE_URL
+        self._r = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def generation(self, center_id):
+        return None
+
+    def get(self, center_id, month):
+        v = self._r.hget(f"schedule:{center_id}", month)
+        return json.loads(v) if v else None
+
+    def set(self, center_id, month, value, generation):
+        key = f"schedule:{center_id}"
+        self._r.hset(key, month, json.dumps(value))
+        self._r.expire(key, self.ttl)
+
+    def delete(self, center_id, months=None):
+        key = f"schedule:{center_id}"
+        if months is None:
+            self._r.delete(key)
+        elif months:
+            self._r.hdel(key, *months)
+
+schedule_cache = (_RedisScheduleCache(SCHEDULE_CACHE_URL, SCHEDULE_CACHE_TTL) if SCHEDULE_CACHE_URL
+                  else _LocalScheduleCache(SCHEDULE_CACHE_SIZE, SCHEDULE_LOCAL_CACHE_TTL))
+
+def _schedule_changed(center_id, dates=None):
+    """Invalidate cached months of a center touched by `dates` (all months if None)."""
+    months = None if dates is None else {d[:7] for d in dates}
+    schedule_cache.delete(str(center_id), months)
+
+def _schedule_changed_for_medic(medic_oid):
+    """A medic's name/email changed or their shifts vanished: drop every month they appear in."""
+    touched = {}
+    for sh in shifts.find({"medic_id": medic_oid}, {"_id": 0, "center_id": 1, "date": 1}):
+        touched.setdefault(sh["center_id"], set()).add(sh["date"])
+    for center_oid, dates in touched.items():
+        _schedule_changed(center_oid, dates)
+
+def _etag(body) -> str:
+    return hashlib.md5(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+
+# --- Shift statistics rollup ---
+def _shift_stats_apply(added=(), removed=()):
+    """Keep shift_stats in step with shift writes; items are (center_oid, "YYYY-MM-DD", medic_oid)."""
+    deltas = {}
+    for sign, items in ((1, added), (-1, removed)):
+        for center_oid, date_str, medic_oid in items:
+            key = (ObjectId(center_oid), date_str[:7], ObjectId(medic_oid))
+            deltas[key] = deltas.get(key, 0) + sign
+    ops = [
+        UpdateOne({"center_id": c, "month": m, "medic_id": mid}, {"$inc": {"count": n}}, upsert=True)
+        for (c, m, mid), n in deltas.items() if n
+    ]
+    if not ops:
+        return
+    shift_stats.bulk_write(ops, ordered=False)
+    emptied = [{"center_id": c, "month": m, "medic_id": mid} for (c, m, mid), n in deltas.items() if n < 0]
+    if emptied:
+        shift_stats.delete_many({"$or": emptied, "count": {"$lte": 0}})
+
+def rebuild_shift_stats():
+    """Recompute shift_stats from the shifts collection."""
+    shifts.aggregate([
+        {"$group": {
+            "_id": {"center_id": "$center_id", "month": {"$substrCP": ["$date", 0, 7]}, "medic_id": "$medic_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "center_id": "$_id.center_id",
+            "month": "$_id.month",
+            "medic_id": "$_id.medic_id",
+            "count": 1,
+        }},
+        {"$out": "shift_stats"},
+    ], allowDiskUse=True)
+
+    # archived months are no longer in shifts
+    archived_months = _archived_months()
+    if archived_months and pq is None:
+        raise RuntimeError("pyarrow is required to read archived shifts")
+    for month in archived_months:
+        rows = pq.read_table(_archive_path(month), columns=["center_id", "medic_id", "date"], memory_map=True) \
+            .group_by(["center_id", "medic_id"]).aggregate([("date", "count")]).to_pylist()
+        if rows:
+            shift_stats.insert_many([{
+                "center_id": ObjectId(r["center_id"]),
+                "month": month,
+                "medic_id": ObjectId(r["medic_id"]),
+                "count": r["date_count"],
+            } for r in rows])
+    return shift_stats.count_documents({})
+
+# --- Shift archive ---
+# Shifts older than SHIFT_ARCHIVE_MONTHS full months are moved out of the live collection
+# into one zstd Parquet file per month: <SHIFT_ARCHIVE_DIR>/month=YYYY-MM/shifts.parquet.
+# Past dates can't be written through the API, so archived months are frozen and always
+# older than anything left in Mongo. Readers use _with_archive / _read_archived_shifts.
+SHIFT_ARCHIVE_DIR = os.getenv("SHIFT_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive", "shifts"))
+SHIFT_ARCHIVE_MONTHS = int(os.getenv("SHIFT_ARCHIVE_MONTHS", "24"))
+
+def _archive_path(month: str) -> str:
+    return os.path.join(SHIFT_ARCHIVE_DIR, f"month={month}", "shifts.parquet")
+
+def _archived_months(lo=None, hi=None) -> list:
+    """Archived "YYYY-MM" months within [lo, hi] (inclusive, either may be None), sorted."""
+    try:
+        names = os.listdir(SHIFT_ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    months = sorted(n[len("month="):] for n in names if n.startswith("month="))
+    return [m for m in months
+            if (lo is None or m >= lo) and (hi is None or m <= hi) and os.path.exists(_archive_path(m))]
+
+def _read_archived_shifts(lo_date: str, hi_date: str, center_oids=None, medic_oid=None):
+    """Yield archived shifts (date, center_id, medic_id) with lo_date <= date <= hi_date, by date."""
+    months = _archived_months(lo_date[:7], hi_date[:7])
+    if not months:
+        return
+    if pq is None:
+        raise RuntimeError("pyarrow is required to read archived shifts")
+    filters = [("date", ">=", lo_date), ("date", "<=", hi_date)]
+    if center_oids:
+        filters.append(("center_id", "in", [str(c) for c in center_oids]))
+    if medic_oid:
+        filters.append(("medic_id", "==", str(medic_oid)))
+    for month in months:
+        table = pq.read_table(_archive_path(month), columns=["date", "center_id", "medic_id"],
+                              filters=filters, memory_map=True).sort_by("date")
+        for row in table.to_pylist():
+            yield {"date": row["date"], "center_id": ObjectId(row["center_id"]), "medic_id": ObjectId(row["medic_id"])}
+
+def _with_archive(cursor, lo_date: str, hi_date: str, center_oids=None, medic_oid=None):
+    """Archived shifts in range, then the live date-sorted cursor (archive is always older)."""
+    return itertools.chain(_read_archived_shifts(lo_date, hi_date, center_oids, medic_oid), cursor)
+
+def archive_shifts(keep_months: int = SHIFT_ARCHIVE_MONTHS) -> dict:
+    """Move shifts older than keep_months full months into the archive. Returns {month: moved}."""
+    if pa is None:
+        raise RuntimeError("pyarrow is required to archive shifts (pip install pyarrow)")
+    today = date.today()
+    y, m = divmod(today.year * 12 + today.month - 1 - keep_months, 12)
+    cutoff = date(y, m + 1, 1).strftime(DATE_FMT)
+
+    schema = pa.schema([
+        ("_id", pa.string()),  # lets a re-run after a crash before delete_many skip rows it already wrote
+        ("date", pa.string()),
+        ("center_id", pa.string()),
+        ("medic_id", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+        ("assigned_by", pa.string()),
+    ])
+    months = [d["_id"] for d in shifts.aggregate([
+        {"$match": {"date": {"$lt": cutoff}}},
+        {"$group": {"_id": {"$substrCP": ["$date", 0, 7]}}},
+        {"$sort": {"_id": 1}},
+    ])]
+    moved = {}
+    for month in months:
+        first, last = _month_bounds(month)
+        docs = list(shifts.find({"date": {"$gte": first.strftime(DATE_FMT), "$lte": last.strftime(DATE_FMT)}}))
+        table = pa.table({
+            "_id": [str(d["_id"]) for d in docs],
+            "date": [d["date"] for d in docs],
+            "center_id": [str(d["center_id"]) for d in docs],
+            "medic_id": [str(d["medic_id"]) for d in docs],
+            "created_at": [d.get("created_at") or d.get("updated_at") for d in docs],
+            "assigned_by": [str(d["assigned_by"]) if d.get("assigned_by") else None for d in docs],
+        }, schema=schema)
+
+        path = _archive_path(month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):  # month archived before (longer horizon, or a crashed run); append
+            old = pq.read_table(path, schema=schema)
+            old = old.filter(pc.invert(pc.is_in(old["_id"], value_set=table["_id"])))
+            table = pa.concat_tables([old, table])
+        tmp = path + ".tmp"
+        pq.write_table(table.sort_by("date"), tmp, compression="zstd")
+        os.replace(tmp, path)  # only delete from Mongo once the file is safely in place
+
+        shifts.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        moved[month] = len(docs)
+    return moved
+
+@app.cli.command("archive-shifts")
+@click.option("--keep-months", default=SHIFT_ARCHIVE_MONTHS, show_default=True,
+              help="Full months of history to keep in Mongo.")
+def archive_shifts_command(keep_months):
+    """Move old shifts into the Parquet archive: `flask --app register archive-shifts`."""
+    moved = archive_shifts(keep_months)
+    for month, n in moved.items():
+        print(f"{month}: {n} shifts archived")
+    print(f"done, {sum(moved.values())} shifts archived")
+
+@app.cli.command("rebuild-shift-stats")
+def rebuild_shift_stats_command():
+    """Backfill/rebuild the report rollup: `flask --app register rebuild-shift-stats`."""
+    n = rebuild_shift_stats()
+    print(f"shift_stats rebuilt: {n} rows")
+
+# --- Availability index ---
+# Per month, Python ints as bitsets (bit d-1 = day d): which days each medic marked busy
+# and which days they are booked at which center. A month is warmed with two queries
+# (shifts + busy_days for that month) and then kept current by this process' writes;
+# AVAILABILITY_TTL bounds how long writes made by other workers can go unseen. It is
+# advisory only - the unique indexes on shifts still decide conflicts.
+AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "60"))
+AVAILABILITY_MONTHS = 24   # months kept in memory
+
+class _AvailabilityIndex:
+    def __init__(self, ttl, max_months):
+        self.ttl = ttl
+        self.max_months = max_months
+        self._months = OrderedDict()  # "YYYY-MM" -> {"at", "busy": {medic: mask}, "booked": {medic: {center: mask}}}
+        self._gens = {}               # "YYYY-MM" -> bumped on every change to that month
+        self._epoch = 0               # bumped by invalidate()
+        self._lock = threading.RLock()
+
+    def _generation(self, month):
+        return self._epoch, self._gens.get(month, 0)
+
+    @staticmethod
+    def _bit(date_str):
+        return 1 << (int(date_str[8:10]) - 1)
+
+    def _load(self, month):
+        first, last = _month_bounds(month)
+        rng = {"$gte": first.strftime(DATE_FMT), "$lte": last.strftime(DATE_FMT)}
+        busy, booked = {}, {}
+        for b in busy_days.find({"date": rng}, {"_id": 0, "medic_id": 1, "date": 1}):
+            busy[b["medic_id"]] = busy.get(b["medic_id"], 0) | self._bit(b["date"])
+        for sh in shifts.find({"date": rng}, {"_id": 0, "medic_id": 1, "center_id": 1, "date": 1}):
+            per_center = booked.setdefault(sh["medic_id"], {})
+            per_center[sh["center_id"]] = per_center.get(sh["center_id"], 0) | self._bit(sh["date"])
+        return {"at": time.monotonic(), "busy": busy, "booked": booked}
+
+    def month(self, month):
+        with self._lock:
+            m = self._months.get(month)
+            if m is not None and time.monotonic() - m["at"] < self.ttl:
+                self._months.move_to_end(month)
+                return m
+            gen = self._generation(month)
+        m = self._load(month)  # outside the lock: two queries
+        with self._lock:
+            if self._generation(month) != gen:
+                return m  # a write landed while we were loading; don't keep a snapshot missing it
+            self._months[month] = m
+            self._months.move_to_end(month)
+            while len(self._months) > self.max_months:
+                self._months.popitem(last=False)
+        return m
+
+    def _flip(self, month, fn):
+        with self._lock:
+            self._gens[month] = self._gens.get(month, 0) + 1
+            m = self._months.get(month)
+            if m is not None:  # not warmed yet: the next read loads fresh data anyway
+                fn(m)
+
+    def set_busy(self, medic_oid, date_str, on=True):
+        bit = self._bit(date_str)
+        def fn(m):
+            cur = m["busy"].get(medic_oid, 0)
+            m["busy"][medic_oid] = cur | bit if on else cur & ~bit
+        self._flip(date_str[:7], fn)
+
+    def set_booked(self, medic_oid, center_oid, date_str, on=True):
+        bit = self._bit(date_str)
+        def fn(m):
+            per_center = m["booked"].setdefault(medic_oid, {})
+            cur = per_center.get(center_oid, 0)
+            per_center[center_oid] = cur | bit if on else cur & ~bit
+        self._flip(date_str[:7], fn)
+
+    def invalidate(self):
+        with self._lock:
+            self._epoch += 1
+            self._months.clear()
+
+    def free_members(self, member_ids, month):
+        """{day number: [medic ids free that day]} for the month (not busy, not booked anywhere)."""
+        m = self.month(month)
+        _, last = _month_bounds(month)
+        taken = {
+            mid: m["busy"].get(mid, 0) | functools.reduce(int.__or__, m["booked"].get(mid, {}).values(), 0)
+            for mid in member_ids
+        }
+        return {
+            day: [mid for mid in member_ids if not taken[mid] >> (day - 1) & 1]
+            for day in range(1, last.day + 1)
+        }
+
+    def states(self, member_ids, center_oid, month):
+        """{medic id: one char per day of the month}, see AVAILABILITY_STATES."""
+        m = self.month(month)
+        _, last = _month_bounds(month)
+        out = {}
+        for mid in member_ids:
+            booked = m["booked"].get(mid, {})
+            here = booked.get(center_oid, 0)
+            elsewhere = functools.reduce(int.__or__, (v for c, v in booked.items() if c != center_oid), 0)
+            busy = m["busy"].get(mid, 0)
+            out[mid] = "".join(
+                "h" if here >> d & 1 else "e" if elsewhere >> d & 1 else "b" if busy >> d & 1 else "f"
+                for d in range(last.day)
+            )
+        return out
+
+AVAILABILITY_STATES = {"f": "free", "b": "busy", "e": "booked elsewhere", "h": "booked here"}
+
+def _rle(s: str) -> str:
+    """Run-length encode a state row: ffffbh -> 4f1b1h."""
+    return "".join(f"{len(list(run))}{ch}" for ch, run in itertools.groupby(s))
+
+availability = _AvailabilityIndex(AVAILABILITY_TTL, AVAILABILITY_MONTHS)
+
+def _shifts_changed(added=(), removed=()):
+    """Every shift write ends here; items are (center_oid, "YYYY-MM-DD", medic_oid)."""
+    _shift_stats_apply(added, removed)
+    for center_oid, date_str, medic_oid in removed:
+        availability.set_booked(ObjectId(medic_oid), ObjectId(center_oid), date_str, on=False)
+    for center_oid, date_str, medic_oid in added:
+        availability.set_booked(ObjectId(medic_oid), ObjectId(center_oid), date_str, on=True)
 
 #schedule
 @app.get("/centers/<center_id>/schedule")
@@ -461,7 +1785,23 @@ def get_schedule(center_id):
         return {"error": str(e)}, 400
 
     center_oid = ObjectId(center_id)
+    month = first.strftime("%Y-%m")  # normalized cache key
 
+    cached = schedule_cache.get(str(center_oid), month)
+    if cached is None:
+        gen = schedule_cache.generation(str(center_oid))
+        body = _build_schedule(center_oid, month, first, last)
+        cached = {"etag": _etag(body), "body": body}
+        schedule_cache.set(str(center_oid), month, cached, gen)
+
+    # If-None-Match -> 304 without rebuilding the schedule; the auth check above still reads
+    # users/memberships unless USER_CACHE_TTL > 0 or JWT_ROLE_CLAIMS is on
+    resp = jsonify(cached["body"])
+    resp.set_etag(cached["etag"])
+    return resp.make_conditional(request)
+
+
+def _build_schedule(center_oid, month, first, last) -> dict:
     # Pull shifts in month + join user to keep names even after membership removal
     pipeline = [
         {"$match": {
@@ -485,6 +1825,19 @@ def get_schedule(center_id):
         }}
     ]
     docs = list(shifts.aggregate(pipeline))
+    lo, hi = first.strftime(DATE_FMT), last.strftime(DATE_FMT)
+    if _archived_months(month, month):
+        archived = list(_read_archived_shifts(lo, hi, center_oids=[center_oid]))
+        people = _user_names(a["medic_id"] for a in archived)
+        for a in archived:
+            u = people.get(a["medic_id"], {})
+            docs.append({
+                "date": a["date"],
+                "medic_id": str(a["medic_id"]),
+                "medic_first_name": u.get("first_name"),
+                "medic_last_name": u.get("last_name"),
+                "medic_email": u.get("email"),
+            })
     assigned = {d["date"]: d for d in docs}
 
     out = []
@@ -502,7 +1855,7 @@ def get_schedule(center_id):
         })
         cur += td(days=1)
 
-    return {"center_id": center_id, "month": month, "days": out}
+    return {"center_id": str(center_oid), "month": month, "days": out}
 
 
 @app.post("/centers/<center_id>/schedule")
@@ -546,8 +1899,9 @@ def assign_shift(center_id):
             return {"error": "Medicul este programat in aceasta zi in alt centru"}, 409
         return {"error": "Day already assigned at this center"}, 409
 
-    center = centers.find_one({"_id": ObjectId(center_id)})
-    _send_system_assignment_message(medic_id, center.get("name", "Center"), date_str)
+    _schedule_changed(center_id, [date_str])
+    _shifts_changed(added=[(center_id, date_str, medic_id)])
+    _queue_assignment_notifications(ObjectId(center_id), [(ObjectId(medic_id), date_str)])
 
     return {"message": "Assigned", "date": date_str, "medic_id": medic_id}, 201
 
@@ -579,7 +1933,7 @@ def replace_shift(center_id):
 
 
     try:
-        shifts.update_one(
+        before = shifts.find_one_and_update(
             {"center_id": ObjectId(center_id), "date": date_str},
             {
                 "$set": {
@@ -588,15 +1942,21 @@ def replace_shift(center_id):
                     "assigned_by": ObjectId(get_jwt_identity())
                 }
             },
-            upsert=True
+            projection={"medic_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
         )
     except DuplicateKeyError as e:
         if "date_1_medic_id_1" in str(e):
             return {"error": "Medicul este deja programat in aceasta zi in alt centru"}, 409
         return {"error": "Conflict while assigning day"}, 409
 
-    center = centers.find_one({"_id": ObjectId(center_id)})
-    _send_system_assignment_message(medic_id, center.get("name", "Center"), date_str)
+    _schedule_changed(center_id, [date_str])
+    _shifts_changed(
+        added=[(center_id, date_str, medic_id)],
+        removed=[(center_id, date_str, before["medic_id"])] if before else ()
+    )
+    _queue_assignment_notifications(ObjectId(center_id), [(ObjectId(medic_id), date_str)])
 
     return {"message": "Assigned (replaced if existed)", "date": date_str, "medic_id": medic_id}
 
@@ -613,42 +1973,427 @@ def unassign_shift(center_id, date_str):
     if _is_past(date_str):
         return {"error": "Cannot assign past dates"}, 400
 
-    res = shifts.delete_one({"center_id": ObjectId(center_id), "date": date_norm})
-    if res.deleted_count == 0:
+    removed = shifts.find_one_and_delete({"center_id": ObjectId(center_id), "date": date_norm}, projection={"medic_id": 1})
+    if not removed:
         return {"error": "No assignment for that date"}, 404
+    _schedule_changed(center_id, [date_norm])
+    _shifts_changed(removed=[(center_id, date_norm, removed["medic_id"])])
     return {"message": "Unassigned", "date": date_norm}
 
+# --- Auto-fill a whole month ---
+def _auto_fill_plan(member_ids, days, here, on_duty, busy):
+    """
+    Greedy month solver. Walks `days` in order and, for every day not yet in `here`,
+    picks the free member with the fewest shifts this month, avoiding consecutive
+    days when possible (falls back to consecutive if nobody else is free).
+    `here` (date -> medic at this center) and `on_duty` ((medic, date) anywhere)
+    are updated in place. Returns [(date, medic_id), ...].
+    """
+    counts = {m: 0 for m in member_ids}
+    for d in days:
+        if here.get(d) in counts:
+            counts[here[d]] += 1
+
+    plan = []
+    for dstr in days:
+        if dstr in here:
+            continue
+        cur = datetime.strptime(dstr, DATE_FMT).date()
+        prev_d = (cur - td(days=1)).strftime(DATE_FMT)
+        next_d = (cur + td(days=1)).strftime(DATE_FMT)
+
+        free = [m for m in member_ids if (m, dstr) not in on_duty and (m, dstr) not in busy]
+        if not free:
+            continue
+        preferred = [m for m in free if (m, prev_d) not in on_duty and (m, next_d) not in on_duty]
+        pick = min(preferred or free, key=lambda m: counts[m])  # ties keep membership order
+
+        here[dstr] = pick
+        on_duty.add((pick, dstr))
+        counts[pick] += 1
+        plan.append((dstr, pick))
+    return plan
+
+
+@app.post("/centers/<center_id>/schedule/auto")
+@require_lead_or_admin
+def auto_schedule(center_id):
+    month = request.args.get("month")
+    if not month:
+        return {"error": "month query param required, e.g., ?month=2025-01"}, 400
+    try:
+        first, last = _month_bounds(month)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    center_oid = ObjectId(center_id)
+    center = centers.find_one({"_id": center_oid}, {"name": 1})
+    if not center:
+        return {"error": "not found"}, 404
+
+    member_ids = memberships.find({"center_id": center_oid}).distinct("user_id")
+    if not member_ids:
+        return {"error": "Centrul nu are membri"}, 400
+
+    lo, hi = first.strftime(DATE_FMT), last.strftime(DATE_FMT)
+    # pad by one day so the consecutive-days rule also sees the neighbouring months
+    pad_lo = (first - td(days=1)).strftime(DATE_FMT)
+    pad_hi = (last + td(days=1)).strftime(DATE_FMT)
+
+    # bulk prefetch: busy days of all members + every shift at this center or of these medics
+    busy = {
+        (b["medic_id"], b["date"])
+        for b in busy_days.find(
+            {"medic_id": {"$in": member_ids}, "date": {"$gte": lo, "$lte": hi}},
+            {"_id": 0, "medic_id": 1, "date": 1}
+        )
+    }
+    here, on_duty = {}, set()
+    for s in shifts.find(
+        {"date": {"$gte": pad_lo, "$lte": pad_hi},
+         "$or": [{"center_id": center_oid}, {"medic_id": {"$in": member_ids}}]},
+        {"_id": 0, "center_id": 1, "medic_id": 1, "date": 1}
+    ):
+        if s["center_id"] == center_oid:
+            here[s["date"]] = s["medic_id"]
+        on_duty.add((s["medic_id"], s["date"]))
+
+    # only today and later can be filled
+    start = max(first, date.today())
+    days = []
+    cur = start
+    while cur <= last:
+        days.append(cur.strftime(DATE_FMT))
+        cur += td(days=1)
+
+    plan = _auto_fill_plan(member_ids, days, here, on_duty, busy)
+
+    now = dt.utcnow()
+    me_oid = ObjectId(get_jwt_identity())
+    docs = [{
+        "center_id": center_oid,
+        "date": d,
+        "medic_id": m,
+        "created_at": now,
+        "assigned_by": me_oid
+    } for d, m in plan]
+
+    failed = set()
+    if docs:
+        try:
+            shifts.insert_many(docs, ordered=False)  # unique indexes still guard against races
+        except BulkWriteError as e:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+
+    _schedule_changed(center_oid, [doc["date"] for doc in inserted])
+    _shifts_changed(added=[(center_oid, doc["date"], doc["medic_id"]) for doc in inserted])
+    _queue_assignment_notifications(center_oid, [(doc["medic_id"], doc["date"]) for doc in inserted])
+
+    return {
+        "message": "Auto-assigned",
+        "month": month,
+        "assigned": [{"date": doc["date"], "medic_id": str(doc["medic_id"])} for doc in inserted],
+        "unfilled": [d for d in days if d not in here],              # nobody free that day
+        "conflicts": [docs[i]["date"] for i in sorted(failed)],      # lost a race with another writer
+    }
+
+
+# --- Batch assign ---
+SCHEDULE_BATCH_MAX = 1000
+
+@app.post("/centers/<center_id>/schedule/batch")
+@require_lead_or_admin
+def batch_assign_shifts(center_id):
+    """
+    Assign many days at once.
+    Body: {"assignments": [{"medic_id": "...", "date": "YYYY-MM-DD", "replace": false}, ...]}
+    Rows with replace=true behave like PUT /schedule (overwrite the day), others like POST.
+    Returns one result per input row, in input order.
+    """
+    data = request.get_json() or {}
+    items = data.get("assignments")
+    if not isinstance(items, list) or not items:
+        return {"error": "assignments (non-empty list) required"}, 400
+    if len(items) > SCHEDULE_BATCH_MAX:
+        return {"error": f"at most {SCHEDULE_BATCH_MAX} assignments per batch"}, 400
+
+    center_oid = ObjectId(center_id)
+    me_oid = ObjectId(get_jwt_identity())
+    results = [None] * len(items)
+
+    # 1. validate shape, dates and ids; one row per day (the center is fixed by the URL),
+    #    otherwise later rows would silently override earlier ones in stats and notifications
+    rows = []  # (row index, medic oid, date, replace)
+    seen_dates = set()
+    for i, it in enumerate(items):
+        it = it if isinstance(it, dict) else {}
+        medic_id, date_str = it.get("medic_id"), it.get("date")
+        if not medic_id or not date_str:
+            results[i] = {"error": "medic_id and date required"}
+            continue
+        try:
+            date_str = _parse_date_str(date_str)
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+            continue
+        if _is_past(date_str):
+            results[i] = {"error": "Cannot assign past dates"}
+            continue
+        try:
+            medic_oid = ObjectId(medic_id)
+        except Exception:
+            results[i] = {"error": "Invalid medic_id"}
+            continue
+        if date_str in seen_dates:
+            results[i] = {"error": "date repeated in batch"}
+            continue
+        seen_dates.add(date_str)
+        rows.append((i, medic_oid, date_str, bool(it.get("replace"))))
+
+    # 2. single prefetch of memberships and busy days for everything in the batch
+    medic_oids = list({r[1] for r in rows})
+    dates = [r[2] for r in rows]
+    member_set, busy = set(), set()
+    if rows:
+        member_set = set(memberships.find(
+            {"center_id": center_oid, "user_id": {"$in": medic_oids}}
+        ).distinct("user_id"))
+        busy = {
+            (b["medic_id"], b["date"])
+            for b in busy_days.find(
+                {"medic_id": {"$in": medic_oids}, "date": {"$gte": min(dates), "$lte": max(dates)}},
+                {"_id": 0, "medic_id": 1, "date": 1}
+            )
+        }
+
+    ops, op_rows = [], []
+    now = dt.utcnow()
+    for i, medic_oid, date_str, replace in rows:
+        if medic_oid not in member_set:
+            results[i] = {"error": "Medicul nu este membru al acestui centru"}
+            continue
+        if (medic_oid, date_str) in busy:
+            results[i] = {"error": "Medicul este indisponibil in aceasta zi"}
+            continue
+        if replace:
+            ops.append(UpdateOne(
+                {"center_id": center_oid, "date": date_str},
+                {"$set": {"medic_id": medic_oid, "updated_at": now, "assigned_by": me_oid}},
+                upsert=True
+            ))
+        else:
+            ops.append(InsertOne({
+                "center_id": center_oid,
+                "date": date_str,
+                "medic_id": medic_oid,
+                "created_at": now,
+                "assigned_by": me_oid
+            }))
+        op_rows.append((i, medic_oid, date_str, replace))
+
+    # days that replace rows may overwrite (to keep shift_stats right)
+    replace_dates = [d for _, _, d, replace in op_rows if replace]
+    previous = {}
+    if replace_dates:
+        previous = {
+            sh["date"]: sh["medic_id"]
+            for sh in shifts.find({"center_id": center_oid, "date": {"$in": replace_dates}},
+                                  {"_id": 0, "date": 1, "medic_id": 1})
+        }
+
+    # 3. one unordered bulk write; map unique-index violations back to their rows
+    failed = {}
+    if ops:
+        try:
+            shifts.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                failed[err["index"]] = err.get("errmsg", "")
+
+    assigned, replaced = [], []
+    for op_idx, (i, medic_oid, date_str, replace) in enumerate(op_rows):
+        if op_idx in failed:
+            errmsg = failed[op_idx]
+            if "date_1_medic_id_1" in errmsg:
+                results[i] = {"error": "Medicul este programat in aceasta zi in alt centru"}
+            elif "center_id_1_date_1" in errmsg:
+                results[i] = {"error": "Day already assigned at this center"}
+            else:
+                results[i] = {"error": "Conflict while assigning day"}
+            continue
+        results[i] = {"status": "replaced" if replace else "assigned"}
+        assigned.append((medic_oid, date_str))
+        if replace and date_str in previous:
+            replaced.append((center_oid, date_str, previous.pop(date_str)))
+
+    _schedule_changed(center_oid, [d for _, d in assigned])
+    _shifts_changed(added=[(center_oid, d, m) for m, d in assigned], removed=replaced)
+    _queue_assignment_notifications(center_oid, assigned)
+
+    out = []
+    for i, it in enumerate(items):
+        it = it if isinstance(it, dict) else {}
+        r = {"index": i, "medic_id": it.get("medic_id"), "date": it.get("date")}
+        if "error" in results[i]:
+            r.update(status="error", error=results[i]["error"])
+        else:
+            r.update(results[i])
+        out.append(r)
+
+    return {"results": out, "assigned": len(assigned), "failed": len(items) - len(assigned)}
+
+@app.get("/centers/<center_id>/availability")
+@require_lead_or_admin
+def center_availability(center_id):
+    """
+    Members x days matrix for the month plus who is free on each day.
+    ?month=YYYY-MM [&date=YYYY-MM-DD to ask about a single day] [&encoding=rle]
+    Each member row is one char per day (see "legend"), run-length encoded with encoding=rle.
+    Answered from the in-memory availability index: one memberships query plus at most
+    two month loads, whatever the number of members.
+    """
+    month = request.args.get("month")
+    date_q = request.args.get("date")
+    encoding = request.args.get("encoding", "plain")
+    if encoding not in ("plain", "rle"):
+        return {"error": "encoding must be plain or rle"}, 400
+    try:
+        if date_q:
+            date_q = _parse_date_str(date_q)
+            month = date_q[:7]
+        if not month:
+            return {"error": "month query param required, e.g., ?month=2025-01"}, 400
+        first, last = _month_bounds(month)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    month = first.strftime("%Y-%m")
+
+    center_oid = ObjectId(center_id)
+    member_ids = memberships.find({"center_id": center_oid}).distinct("user_id")
+    free = availability.free_members(member_ids, month)
+    days = [
+        {"date": f"{month}-{day:02d}", "free": [str(m) for m in ids]}
+        for day, ids in free.items()
+        if not date_q or int(date_q[8:10]) == day
+    ]
+    states = availability.states(member_ids, center_oid, month)
+    members = [
+        {"user_id": str(mid), "states": _rle(row) if encoding == "rle" else row}
+        for mid, row in states.items()
+    ]
+    return {
+        "center_id": center_id, "month": month, "days_in_month": last.day,
+        "encoding": encoding, "legend": AVAILABILITY_STATES,
+        "members": members, "days": days,
+    }
+
 #messages
 # --- Messaging helpers ---
 def dm_conversation_id(a: str, b: str) -> str:
     # deterministic, order-independent
     return "dm_" + "_".join(sorted([a, b]))
 
+MESSAGES_PAGE_MAX = 200
+
+def _parse_cursor_ts(value: str):
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("Invalid cursor, expected a message id or an ISO timestamp")
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)  # stored as naive UTC
+    return ts
+
+def _keyset(field: str, ts, tie, op: str) -> dict:
+    """Strictly after/before (timestamp, field=tie): ids from different workers don't follow time."""
+    return {"$or": [{"timestamp": {op: ts}}, {"timestamp": ts, field: {op: tie}}]}
+
+def _apply_cursor(q: dict, value: str, op: str):
+    """Add a since/before bound on (timestamp, _id) to q: value is a message ObjectId or an ISO timestamp."""
+    if ObjectId.is_valid(value):
+        oid = ObjectId(value)
+        ref = messages.find_one({"_id": oid}, {"timestamp": 1})
+        bound = _keyset("_id", ref["timestamp"], oid, op) if ref else {"_id": {op: oid}}  # deleted: best effort
+    else:
+        bound = {"timestamp": {op: _parse_cursor_ts(value)}}
+    q.setdefault("$and", []).append(bound)
+
 @app.get("/conversations")
 @jwt_required()
 def list_conversations():
+    # optional ?since=<cursor from a previous call | message id | ISO timestamp>:
+    # only conversations with newer messages
     uid = ObjectId(get_jwt_identity())
 
-    pipeline = [
-        {"$match": {"$or": [{"to": uid}, {"from": str(uid)}]}},
-        {"$sort": {"timestamp": -1}},
-        {"$group": {
-            "_id": "$conversation_id",
-            "last_message": {"$first": "$content"},
-            "timestamp": {"$first": "$timestamp"}
-        }},
-        {"$sort": {"timestamp": -1}},
-    ]
-    items = list(messages.aggregate(pipeline))
+    q = {"participant": uid}
+    since = request.args.get("since")
+    if since:
+        ts_part, _, conv_id = since.partition("|")  # our own cursors are "<timestamp>|<conversation_id>"
+        try:
+            if ObjectId.is_valid(ts_part) and not conv_id:
+                # message-id cursor: summaries are keyed by time, so use that message's timestamp
+                ref = messages.find_one({"_id": ObjectId(ts_part)}, {"timestamp": 1, "conversation_id": 1})
+                if ref:
+                    q.update(_keyset("conversation_id", ref["timestamp"], ref["conversation_id"], "$gt"))
+            elif conv_id:
+                q.update(_keyset("conversation_id", _parse_cursor_ts(ts_part), conv_id, "$gt"))
+            else:
+                q["timestamp"] = {"$gt": _parse_cursor_ts(ts_part)}
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+    # single range read on (participant, timestamp, conversation_id)
+    items = conversations.find(q, {"_id": 0, "participant": 0}).sort([("timestamp", -1), ("conversation_id", -1)])
     # normalize
     out = []
     for it in items:
         out.append({
-            "conversation_id": it["_id"],
+            "conversation_id": it["conversation_id"],
             "last_message": it.get("last_message"),
-            "timestamp": it.get("timestamp").isoformat() + "Z" if it.get("timestamp") else None
+            "timestamp": it.get("timestamp").isoformat() + "Z" if it.get("timestamp") else None,
+            "unread": it.get("unread", 0),
         })
-    return {"conversations": out}
+    # newest first, so the first row is the next ?since=
+    cursor = f"{out[0]['timestamp']}|{out[0]['conversation_id']}" if out and out[0]["timestamp"] else since
+    return {"conversations": out, "cursor": cursor}
+
+
+@app.get("/conversations/unread")
+@jwt_required()
+def unread_counts():
+    """Badge count: one read of the user's counter; ?detail=1 adds per-conversation counts."""
+    uid = ObjectId(get_jwt_identity())
+    u = users.find_one({"_id": uid}, {"unread_total": 1}) or {}
+    out = {"total": max(0, u.get("unread_total", 0))}
+    if (request.args.get("detail") or "").lower() in ("1", "true", "yes"):
+        out["conversations"] = {
+            c["conversation_id"]: c["unread"]
+            for c in conversations.find({"participant": uid, "unread": {"$gt": 0}},
+                                        {"_id": 0, "conversation_id": 1, "unread": 1})
+        }
+    return out
+
+
+@app.post("/messages/<conversation_id>/read")
+@jwt_required()
+def mark_conversation_read(conversation_id):
+    uid = ObjectId(get_jwt_identity())
+    now = dt.utcnow()
+    prev = conversations.find_one_and_update(
+        {"participant": uid, "conversation_id": conversation_id},
+        {"$set": {"unread": 0}}
+    )
+    if not prev:
+        return {"error": "Not found"}, 404
+    read_markers.update_one(
+        {"participant": uid, "conversation_id": conversation_id},
+        {"$set": {"last_read": now}},
+        upsert=True
+    )
+    if prev.get("unread"):
+        users.update_one({"_id": uid}, {"$inc": {"unread_total": -prev["unread"]}})
+    return {"message": "read", "conversation_id": conversation_id, "last_read": now.isoformat() + "Z"}
 
 
 @app.get("/messages/<conversation_id>")
@@ -659,13 +2404,39 @@ def get_messages(conversation_id):
 
     # user must be a participant (to == me OR from == me)
     q = {"conversation_id": conversation_id, "$or": [{"to": uid}, {"from": uid_str}]}
-    docs = list(messages.find(q).sort("timestamp", 1))
+
+    # ?since=  -> only newer messages (polling)
+    # ?before= / ?limit= -> page backwards through history, newest page first
+    since = request.args.get("since")
+    before = request.args.get("before")
+    try:
+        if since:
+            _apply_cursor(q, since, "$gt")
+        if before:
+            _apply_cursor(q, before, "$lt")
+        limit = request.args.get("limit", type=int)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if before or limit:
+        limit = max(1, min(limit or MESSAGES_PAGE_MAX, MESSAGES_PAGE_MAX))
+        cur = messages.find(q).sort([("timestamp", -1), ("_id", -1)]).limit(limit)
+        docs = list(cur)[::-1]
+        has_more = len(docs) == limit
+    else:
+        docs = list(messages.find(q).sort([("timestamp", 1), ("_id", 1)]))
+        has_more = False
+
     for d in docs:
         d["_id"] = str(d["_id"])
         # normalize ObjectId to string
         if isinstance(d.get("to"), ObjectId):
             d["to"] = str(d["to"])
-    return {"messages": docs}
+    return {
+        "messages": docs,
+        "cursor": docs[-1]["_id"] if docs else since,                 # pass back as ?since=
+        "before": docs[0]["_id"] if docs and has_more else None,     # pass back as ?before= for older
+    }
 
 @app.post("/messages")
 @jwt_required()
@@ -696,8 +2467,171 @@ def send_message():
         "system": False,
     }
     messages.insert_one(msg)
+    _messages_inserted(msg)
     return {"message": "sent", "conversation_id": conv_id}, 201
 
+
+@app.post("/messages/stream/ticket")
+@jwt_required()
+def message_stream_ticket():
+    # keeps the real access token out of URLs (access logs, proxies, Referer)
+    ticket = create_access_token(
+        identity=str(get_jwt_identity()),
+        expires_delta=td(seconds=STREAM_TICKET_TTL),
+        additional_claims={"scope": "stream"},
+    )
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL}
+
+@app.get("/messages/stream")
+@jwt_required(locations=["query_string"])
+def message_stream():
+    """
+    Server-Sent Events: one `message` event per new message where the caller is a
+    participant (carries the message and the conversation summary delta).
+    Replaces polling /conversations and /messages/<id>.
+    ?jwt=<ticket from POST /messages/stream/ticket>; the ticket is checked once, on connect.
+    """
+    if get_jwt().get("scope") != "stream":
+        return {"error": "stream ticket required"}, 401
+    uid = str(get_jwt_identity())
+    with _subscribers_lock:
+        if STREAM_MAX_CONNECTIONS and _stream_count["open"] >= STREAM_MAX_CONNECTIONS:
+            resp = jsonify({"error": "Prea multe conexiuni live, se revine la polling"})
+            resp.headers["Retry-After"] = "30"
+            return resp, 503
+        _stream_count["open"] += 1
+    q = _subscribe(uid)
+
+    def release():
+        _unsubscribe(uid, q)
+        with _subscribers_lock:
+            _stream_count["open"] -= 1
+
+    def gen():
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = q.get(timeout=STREAM_KEEPALIVE)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    resp = Response(gen(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",   # don't let nginx buffer the stream
+    })
+    resp.call_on_close(release)  # runs on disconnect even if the body never started
+    return resp
+
+# --- Multi-center / multi-month schedule ---
+SCHEDULE_RANGE_MAX_DAYS = 366
+SCHEDULE_RANGE_MAX_CENTERS = 100
+
+def _parse_center_ids(param) -> list:
+    """Comma-separated center ids -> de-duplicated ObjectIds (raises on a bad id)."""
+    return list(dict.fromkeys(ObjectId(c.strip()) for c in (param or "").split(",") if c.strip()))
+
+def _centers_forbidden(center_oids):
+    """Error response if the caller may not read every center in center_oids, else None."""
+    me = _auth_info()
+    if not me:
+        return {"error": "Neautorizat"}, 401
+    if me.get("global_role") != "admin" and any(not _center_role(me, c) for c in center_oids):
+        return {"error": "Neautorizat (members only)"}, 403
+    return None
+
+def _dates_between(start, end):
+    out = []
+    cur = start
+    while cur <= end:
+        out.append(cur.strftime(DATE_FMT))
+        cur += td(days=1)
+    return out
+
+def _merge_schedule_rows(cursor, dates, center_oids):
+    """
+    Walk a date-sorted shifts cursor alongside `dates`, yielding (date, {center_oid: shift})
+    for every date, so dense schedules stream without holding the range in memory.
+    """
+    it = iter(cursor)
+    pending = next(it, None)
+    wanted = set(center_oids)
+    for dstr in dates:
+        day = {}
+        while pending is not None and pending["date"] <= dstr:
+            if pending["date"] == dstr and pending["center_id"] in wanted:
+                day[pending["center_id"]] = pending
+            pending = next(it, None)
+        yield dstr, day
+
+@app.get("/schedule/range")
+@jwt_required()
+def schedule_range():
+    """
+    /schedule/range?center_ids=a,b,c&from=YYYY-MM-DD&to=YYYY-MM-DD
+    Columnar, streamed response:
+      {"from", "to", "centers": [ids], "dates": [...],
+       "grid": [[medic index | null per center] per date],
+       "medics": [{"id", "first_name", "last_name", "email"}]}
+    grid[d][c] indexes into medics.
+    """
+    try:
+        center_oids = _parse_center_ids(request.args.get("center_ids"))
+        start = datetime.strptime(_parse_date_str(request.args.get("from") or ""), DATE_FMT).date()
+        end = datetime.strptime(_parse_date_str(request.args.get("to") or ""), DATE_FMT).date()
+    except Exception:
+        return {"error": "center_ids, from and to (YYYY-MM-DD) required"}, 400
+    if not center_oids:
+        return {"error": "center_ids required"}, 400
+    if len(center_oids) > SCHEDULE_RANGE_MAX_CENTERS:
+        return {"error": f"at most {SCHEDULE_RANGE_MAX_CENTERS} centers"}, 400
+    if end < start or (end - start).days >= SCHEDULE_RANGE_MAX_DAYS:
+        return {"error": f"from..to must span 1..{SCHEDULE_RANGE_MAX_DAYS} days"}, 400
+
+    forbidden = _centers_forbidden(center_oids)
+    if forbidden:
+        return forbidden
+
+    dates = _dates_between(start, end)
+    col = {c: i for i, c in enumerate(center_oids)}
+    q = {"center_id": {"$in": center_oids}, "date": {"$gte": dates[0], "$lte": dates[-1]}}
+
+    def gen():
+        yield '{"from":%s,"to":%s,"centers":%s,"dates":%s,"grid":[' % (
+            json.dumps(dates[0]), json.dumps(dates[-1]),
+            json.dumps([str(c) for c in center_oids]), json.dumps(dates))
+
+        medic_index = {}  # medic oid -> position in "medics"
+        cursor = _with_archive(
+            shifts.find(q, {"_id": 0, "center_id": 1, "date": 1, "medic_id": 1}).sort("date", 1).batch_size(1000),
+            dates[0], dates[-1], center_oids=center_oids
+        )
+        for n, (dstr, day) in enumerate(_merge_schedule_rows(cursor, dates, center_oids)):
+            row = [None] * len(center_oids)
+            for c, sh in day.items():
+                row[col[c]] = medic_index.setdefault(sh["medic_id"], len(medic_index))
+            yield ("," if n else "") + json.dumps(row)
+
+        # one deduplicated users lookup for everyone in the grid
+        found = {
+            u["_id"]: u
+            for u in users.find({"_id": {"$in": list(medic_index)}}, {"first_name": 1, "last_name": 1, "email": 1})
+        }
+        medics = []
+        for oid in medic_index:  # dicts keep insertion order == index order
+            u = found.get(oid, {})
+            medics.append({
+                "id": str(oid),
+                "first_name": u.get("first_name"),
+                "last_name": u.get("last_name"),
+                "email": u.get("email"),
+            })
+        yield '],"medics":' + json.dumps(medics) + "}"
+
+    return Response(gen(), mimetype="application/json")
+
+
 #calendar personal
 @app.get("/my/schedule")
 @jwt_required()
@@ -728,6 +2662,16 @@ def my_schedule():
         {"$sort": {"date": 1}}
     ]
     days = list(shifts.aggregate(pipeline))
+
+    lo, hi = first.strftime(DATE_FMT), last.strftime(DATE_FMT)
+    if _archived_months(lo[:7], hi[:7]):
+        archived = list(_read_archived_shifts(lo, hi, medic_oid=uid))
+        names = _center_names(list({a["center_id"] for a in archived})) if archived else {}
+        days = [{
+            "date": a["date"],
+            "center_id": str(a["center_id"]),
+            "center_name": names.get(a["center_id"], "Center"),
+        } for a in archived] + days
     return {"month": month, "days": days}
 
 
@@ -777,6 +2721,7 @@ def add_busy_day():
         busy_days.insert_one({"medic_id": uid, "date": date_norm, "created_at": dt.utcnow()})
     except DuplicateKeyError:
         return {"error": "Already marked busy for this date"}, 409
+    availability.set_busy(uid, date_norm, on=True)
 
     return {"message": "Zi indisponibila adaugata", "date": date_norm}, 201
 
@@ -795,6 +2740,7 @@ def remove_busy_day(date_str):
     res = busy_days.delete_one({"medic_id": uid, "date": date_norm})
     if res.deleted_count == 0:
         return {"error": "Busy day not found"}, 404
+    availability.set_busy(uid, date_norm, on=False)
     return {"message": "Zi indisponibila stearsa", "date": date_norm}
 
 # --- Profile update: first_name, last_name, phone ---
@@ -814,6 +2760,10 @@ def update_me():
         return {"message": "Nothing to update"}, 200
 
     users.update_one({"_id": uid}, {"$set": update})
+    if "first_name" in update or "last_name" in update:
+        _refresh_search_terms(uid)
+        _schedule_changed_for_medic(uid)  # names are baked into cached schedules
+    _contacts_changed_for_user(uid)
     # return the fresh doc (without password)
     user = users.find_one({"_id": uid}, {"password_hash": 0})
     user["_id"] = str(user["_id"])
@@ -840,13 +2790,12 @@ def change_password():
     user = users.find_one({"_id": uid})
     if not user:
         return {"error": "User not found"}, 404
-    if not bcrypt.checkpw(current, user["password_hash"]):
-        return {"error": "Parola curenta este gresita"}, 400
-
-    if bcrypt.checkpw(new, user["password_hash"]):
+    if new == current:  # current was just checked against the hash, no second checkpw needed
         return {"error": "Noua parola trebuie sa fie diferita de cea veche"}, 400
+    if not check_password(current, user["password_hash"]):
+        return {"error": "Parola curenta este gresita"}, 400
 
-    hashed = bcrypt.hashpw(new, bcrypt.gensalt())
+    hashed = hash_password(new)
     users.update_one({"_id": uid}, {"$set": {"password_hash": hashed}})
     return {"message": "Password changed"}, 200
 
@@ -868,19 +2817,91 @@ def find_user_by_email():
         "status": u.get("status", "pending"),
     }
 
+USER_SEARCH_LIMIT = 10
+USER_SEARCH_LIMIT_MAX = 25
+
+@app.get("/users/search")
+@jwt_required()
+def search_users():
+    """
+    Typeahead for adding members: ?q=<prefix of first/last name or email>&center_id=<id>[&limit=N]
+    Approved users only, minus the center's current members. Leads of that center or admins.
+    """
+    term = _search_norm(request.args.get("q"))
+    center_id = request.args.get("center_id")
+    if not term:
+        return {"users": []}
+    me = _auth_info()
+    is_admin = bool(me) and me.get("global_role") == "admin"
+    if center_id and not ObjectId.is_valid(center_id):
+        return {"error": "Invalid center_id"}, 400
+    if not is_admin and (not center_id or _center_role(me, center_id) != "lead"):
+        return {"error": "Neautorizat (doar coordonator)"}, 403
+    try:
+        limit = min(max(int(request.args.get("limit", USER_SEARCH_LIMIT)), 1), USER_SEARCH_LIMIT_MAX)
+    except ValueError:
+        return {"error": "limit must be a number"}, 400
+
+    q = {"status": "approved", "search_terms": {"$regex": "^" + re.escape(term)}}
+    if center_id:
+        q["_id"] = {"$nin": memberships.find({"center_id": ObjectId(center_id)}).distinct("user_id")}
+    found = users.find(q, {"first_name": 1, "last_name": 1, "email": 1}).limit(limit)
+    out = [{
+        "id": str(u["_id"]),
+        "first_name": u.get("first_name", ""),
+        "last_name": u.get("last_name", ""),
+        "email": u.get("email", ""),
+    } for u in found]
+    out.sort(key=lambda u: (_search_norm(u["last_name"]), _search_norm(u["first_name"]), u["email"]))
+    return {"users": out}
+
 #reports
+def _report_rows(match: dict, by_center: bool = False):
+    """Assigned days per medic (per center and medic if by_center), read from the shift_stats rollup."""
+    group_id = {"medic_id": "$medic_id"}
+    if by_center:
+        group_id["center_id"] = "$center_id"
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": group_id, "count": {"$sum": "$count"}}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "_id.medic_id",
+            "foreignField": "_id",
+            "as": "user"
+        }},
+        {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+    ]
+    project = {
+        "_id": 0,
+        "medic_id": {"$toString": "$_id.medic_id"},
+        "count": 1,
+        "first_name": {"$ifNull": ["$user.first_name", "$user.username"]},
+        "last_name": {"$ifNull": ["$user.last_name", ""]},
+        "email": "$user.email"
+    }
+    sort = {"count": -1, "first_name": 1, "last_name": 1}
+    if by_center:
+        pipeline += [
+            {"$lookup": {"from": "centers", "localField": "_id.center_id", "foreignField": "_id", "as": "center"}},
+            {"$unwind": {"path": "$center", "preserveNullAndEmptyArrays": True}},
+        ]
+        project["center_id"] = {"$toString": "$_id.center_id"}
+        project["center_name"] = {"$ifNull": ["$center.name", "Center"]}
+        sort = {"center_name": 1, **sort}
+    pipeline += [{"$project": project}, {"$sort": sort}]
+    return list(shift_stats.aggregate(pipeline))
+
+
 @app.get("/centers/<center_id>/reports")
 @jwt_required()
 def center_reports(center_id):
     # Only members (or admin) can see reports for a center
-    me_id = ObjectId(get_jwt_identity())
-    me = users.find_one({"_id": me_id})
+    me = _auth_info()
     if not me:
         return {"error": "Neautorizat"}, 401
-    if me.get("global_role") != "admin":
-        m = memberships.find_one({"center_id": ObjectId(center_id), "user_id": me_id})
-        if not m:
-            return {"error": "Neautorizat (members only)"}, 403
+    if me.get("global_role") != "admin" and not _center_role(me, center_id):
+        return {"error": "Neautorizat (members only)"}, 403
 
     month = (request.args.get("month") or "").strip()  # YYYY-MM
     if not month:
@@ -891,36 +2912,7 @@ def center_reports(center_id):
     except ValueError as e:
         return {"error": str(e)}, 400
 
-    center_oid = ObjectId(center_id)
-
-    pipeline = [
-        {"$match": {
-            "center_id": center_oid,
-            "date": {"$gte": first.strftime(DATE_FMT), "$lte": last.strftime(DATE_FMT)}
-        }},
-        {"$group": {
-            "_id": "$medic_id",
-            "count": {"$sum": 1}
-        }},
-        {"$lookup": {
-            "from": "users",
-            "localField": "_id",
-            "foreignField": "_id",
-            "as": "user"
-        }},
-        {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 0,
-            "medic_id": {"$toString": "$_id"},
-            "count": 1,
-            "first_name": {"$ifNull": ["$user.first_name", "$user.username"]},
-            "last_name": {"$ifNull": ["$user.last_name", ""]},
-            "email": "$user.email"
-        }},
-        {"$sort": {"count": -1, "first_name": 1, "last_name": 1}}
-    ]
-
-    rows = list(shifts.aggregate(pipeline))
+    rows = _report_rows({"center_id": ObjectId(center_id), "month": first.strftime("%Y-%m")})
     total = sum(r["count"] for r in rows)
     return {"center_id": center_id, "month": month, "rows": rows, "total": total}
 
@@ -929,14 +2921,11 @@ def center_reports(center_id):
 @jwt_required()
 def center_reports_csv(center_id):
     # auth: member or admin (same as JSON report)
-    me_id = ObjectId(get_jwt_identity())
-    me = users.find_one({"_id": me_id})
+    me = _auth_info()
     if not me:
         return {"error": "Neautorizat"}, 401
-    if me.get("global_role") != "admin":
-        m = memberships.find_one({"center_id": ObjectId(center_id), "user_id": me_id})
-        if not m:
-            return {"error": "Neautorizat (members only)"}, 403
+    if me.get("global_role") != "admin" and not _center_role(me, center_id):
+        return {"error": "Neautorizat (members only)"}, 403
 
     month = (request.args.get("month") or "").strip()
     if not month:
@@ -947,45 +2936,260 @@ def center_reports_csv(center_id):
     except ValueError as e:
         return {"error": str(e)}, 400
 
-    center_oid = ObjectId(center_id)
-    pipeline = [
-        {"$match": {
-            "center_id": center_oid,
-            "date": {"$gte": first.strftime(DATE_FMT), "$lte": last.strftime(DATE_FMT)}
-        }},
-        {"$group": {"_id": "$medic_id", "count": {"$sum": 1}}},
-        {"$lookup": {
-            "from": "users",
-            "localField": "_id",
-            "foreignField": "_id",
-            "as": "user"
-        }},
-        {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 0,
-            "medic_id": {"$toString": "$_id"},
-            "first_name": {"$ifNull": ["$user.first_name", "$user.username"]},
-            "last_name": {"$ifNull": ["$user.last_name", ""]},
-            "email": "$user.email",
-            "count": 1
-        }},
-        {"$sort": {"count": -1, "first_name": 1, "last_name": 1}}
-    ]
-    rows = list(shifts.aggregate(pipeline))
-
-    # build CSV
-    sio = StringIO()
-    w = csv.writer(sio)
-    w.writerow(["medic_id", "first_name", "last_name", "email", "assigned_days"])
+    rows = _report_rows({"center_id": ObjectId(center_id), "month": first.strftime("%Y-%m")})
     for r in rows:
-        w.writerow([r.get("medic_id",""), r.get("first_name",""), r.get("last_name",""), r.get("email",""), r.get("count",0)])
+        r["assigned_days"] = r.pop("count", 0)
 
-    resp = make_response(sio.getvalue())
-    resp.headers["Content-Type"] = "text/csv; charset=utf-8"
-    resp.headers["Content-Disposition"] = f'attachment; filename="center_{center_id}_{month}_report.csv"'
-    return resp
+    return _stream_export(
+        ["medic_id", "first_name", "last_name", "email", "assigned_days"],
+        [rows], "csv", f"center_{center_id}_{month}_report"
+    )
+
+# --- Streaming exports ---
+# /export/<kind>?format=csv|ndjson streams rows as the cursor is read, EXPORT_BATCH_SIZE
+# documents at a time (names/emails are looked up once per batch), so a year of payroll
+# across every center runs in constant memory.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "ndjson")
+
+def _batched(cursor, n=EXPORT_BATCH_SIZE):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _stream_export(columns, batches, fmt, filename):
+    """batches: iterable of lists of row dicts. Yields one chunk per batch."""
+    def gen():
+        if fmt == "csv":
+            sio = StringIO()
+            w = csv.writer(sio)
+            w.writerow(columns)
+            for rows in batches:
+                for r in rows:
+                    w.writerow(["" if r.get(c) is None else r.get(c) for c in columns])
+                yield sio.getvalue()
+                sio.seek(0)
+                sio.truncate()
+            yield sio.getvalue()  # header only, if there were no rows
+        else:
+            for rows in batches:
+                yield "".join(json.dumps({c: r.get(c) for c in columns}, default=str) + "\n" for r in rows)
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(gen(), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+        "X-Accel-Buffering": "no",
+    })
+
+def _user_names(oids) -> dict:
+    return {
+        u["_id"]: u
+        for u in users.find({"_id": {"$in": list(set(oids))}}, {"first_name": 1, "last_name": 1, "email": 1})
+    }
+
+def _center_names(center_oids=None) -> dict:
+    q = {"_id": {"$in": center_oids}} if center_oids else {}
+    return {c["_id"]: c.get("name", "Center") for c in centers.find(q, {"name": 1})}
+
+def _medic_fields(u: dict) -> dict:
+    return {"first_name": u.get("first_name"), "last_name": u.get("last_name"), "email": u.get("email")}
+
+@app.get("/export/<kind>")
+@jwt_required()
+def export(kind):
+    """
+    kind = shifts    ?from=YYYY-MM-DD&to=YYYY-MM-DD[&center_ids=...]  one row per assigned day
+           schedule  ?from=YYYY-MM-DD&to=YYYY-MM-DD&center_ids=...    one row per day x center
+           reports   ?from=YYYY-MM[&to=YYYY-MM][&center_ids=...]      assigned days per center/month/medic
+           support   [?from=YYYY-MM-DD&to=YYYY-MM-DD]                 support tickets (admin)
+    center_ids may only be omitted by admins (= all centers).
+    """
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return {"error": "format must be csv or ndjson"}, 400
+    if kind not in ("shifts", "schedule", "reports", "support"):
+        return {"error": "unknown export"}, 404
+
+    me = _auth_info()
+    if not me:
+        return {"error": "Neautorizat"}, 401
+    is_admin = me.get("global_role") == "admin"
+    if kind == "support" and not is_admin:
+        return {"error": "Neautorizat (admin only)"}, 403
+
+    try:
+        center_oids = _parse_center_ids(request.args.get("center_ids"))
+    except Exception:
+        return {"error": "Invalid center_ids"}, 400
+    if kind != "support":
+        if not center_oids and (kind == "schedule" or not is_admin):
+            return {"error": "center_ids required"}, 400
+        forbidden = _centers_forbidden(center_oids)
+        if forbidden:
+            return forbidden
+
+    from_q, to_q = request.args.get("from"), request.args.get("to")
+    try:
+        if kind == "reports":
+            first, _ = _month_bounds(from_q or "")
+            _, last = _month_bounds(to_q or from_q)
+            lo, hi = first.strftime("%Y-%m"), last.strftime("%Y-%m")
+        elif kind == "support":
+            lo = datetime.strptime(_parse_date_str(from_q), DATE_FMT) if from_q else None
+            hi = datetime.strptime(_parse_date_str(to_q), DATE_FMT) + td(days=1) if to_q else None
+        else:
+            lo, hi = _parse_date_str(from_q or ""), _parse_date_str(to_q or "")
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if lo and hi and hi < lo:
+        return {"error": "to must not be before from"}, 400
+
+    in_centers = {"center_id": {"$in": center_oids}} if center_oids else {}
+    names = _center_names(center_oids) if kind != "support" else {}
+    label = f"{kind}_{from_q or 'all'}_{to_q or from_q or 'all'}"
+
+    if kind == "shifts":
+        columns = ["date", "center_id", "center_name", "medic_id", "first_name", "last_name", "email"]
+        cursor = _with_archive(
+            shifts.find({**in_centers, "date": {"$gte": lo, "$lte": hi}},
+                        {"_id": 0, "date": 1, "center_id": 1, "medic_id": 1})
+            .sort("date", 1).batch_size(EXPORT_BATCH_SIZE),
+            lo, hi, center_oids=center_oids
+        )
+
+        def batches():
+            for batch in _batched(cursor):
+                people = _user_names(sh["medic_id"] for sh in batch)
+                yield [{
+                    "date": sh["date"],
+                    "center_id": str(sh["center_id"]),
+                    "center_name": names.get(sh["center_id"]),
+                    "medic_id": str(sh["medic_id"]),
+                    **_medic_fields(people.get(sh["medic_id"], {})),
+                } for sh in batch]
+
+    elif kind == "schedule":
+        columns = ["date", "center_id", "center_name", "assigned", "medic_id", "first_name", "last_name", "email"]
+        start = datetime.strptime(lo, DATE_FMT).date()
+        end = datetime.strptime(hi, DATE_FMT).date()
+        cursor = _with_archive(
+            shifts.find({**in_centers, "date": {"$gte": lo, "$lte": hi}},
+                        {"_id": 0, "date": 1, "center_id": 1, "medic_id": 1})
+            .sort("date", 1).batch_size(EXPORT_BATCH_SIZE),
+            lo, hi, center_oids=center_oids
+        )
+
+        def batches():
+            days_per_batch = max(1, EXPORT_BATCH_SIZE // len(center_oids))
+            chunk = []
+            for dstr, day in _merge_schedule_rows(cursor, _dates_between(start, end), center_oids):
+                chunk.append((dstr, day))
+                if len(chunk) < days_per_batch:
+                    continue
+                yield _schedule_export_rows(chunk, center_oids, names)
+                chunk = []
+            if chunk:
+                yield _schedule_export_rows(chunk, center_oids, names)
+
+    elif kind == "reports":
+        columns = ["center_id", "center_name", "month", "medic_id", "first_name", "last_name", "email", "assigned_days"]
+        cursor = (shift_stats.find({**in_centers, "month": {"$gte": lo, "$lte": hi}}, {"_id": 0})
+                  .sort([("center_id", 1), ("month", 1), ("medic_id", 1)]).batch_size(EXPORT_BATCH_SIZE))
+
+        def batches():
+            for batch in _batched(cursor):
+                people = _user_names(r["medic_id"] for r in batch)
+                yield [{
+                    "center_id": str(r["center_id"]),
+                    "center_name": names.get(r["center_id"]),
+                    "month": r["month"],
+                    "medic_id": str(r["medic_id"]),
+                    **_medic_fields(people.get(r["medic_id"], {})),
+                    "assigned_days": r.get("count", 0),
+                } for r in batch]
+
+    else:  # support
+        columns = ["id", "created_at", "status", "resolved", "email", "user_id", "message"]
+        q = {}
+        if lo or hi:
+            q["created_at"] = {k: v for k, v in (("$gte", lo), ("$lt", hi)) if v}
+        cursor = support.find(q).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+
+        def batches():
+            for batch in _batched(cursor):
+                yield [{c: item[c] for c in columns} for item in map(_support_item, batch)]
+
+    return _stream_export(columns, batches(), fmt, label)
+
+def _schedule_export_rows(chunk, center_oids, names):
+    people = _user_names(sh["medic_id"] for _, day in chunk for sh in day.values())
+    rows = []
+    for dstr, day in chunk:
+        for c in center_oids:
+            sh = day.get(c)
+            rows.append({
+                "date": dstr,
+                "center_id": str(c),
+                "center_name": names.get(c),
+                "assigned": bool(sh),
+                "medic_id": str(sh["medic_id"]) if sh else None,
+                **(_medic_fields(people.get(sh["medic_id"], {})) if sh else {}),
+            })
+    return rows
+
+# --- Admin: cross-center report ---
+@app.get("/admin/reports")
+@admin_required
+def admin_reports():
+    """
+    Assigned days per center and medic over a month range, e.g. a whole year:
+    /admin/reports?from=2025-01&to=2025-12  (to defaults to from)
+    """
+    from_m = (request.args.get("from") or "").strip()
+    to_m = (request.args.get("to") or from_m).strip()
+    if not from_m:
+        return {"error": "from query param required, e.g., ?from=2025-01&to=2025-12"}, 400
+    try:
+        first, _ = _month_bounds(from_m)
+        _, last = _month_bounds(to_m)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if last < first:
+        return {"error": "to must not be before from"}, 400
+
+    from_m, to_m = first.strftime("%Y-%m"), last.strftime("%Y-%m")
+    rows = _report_rows({"month": {"$gte": from_m, "$lte": to_m}}, by_center=True)
+    total = sum(r["count"] for r in rows)
+    return {"from": from_m, "to": to_m, "rows": rows, "total": total}
 
 #support
+# A ticket's state is `status`: "open" until an admin resolves it ("resolved", with resolved_at).
+# Tickets written before that had a separate `resolved` flag; ensure_indexes folds it into
+# `status` at startup (`flask migrate-support-status` also drops the indexes it used).
+SUPPORT_STATUSES = ("open", "resolved")
+SUPPORT_MESSAGE_MAX = 5000
+SUPPORT_PAGE = 50
+SUPPORT_PAGE_MAX = 200
+_support_counts = {"at": 0.0, "body": None}
+
+def _support_item(d) -> dict:
+    status = "resolved" if d.get("resolved") else (d.get("status") or "open")
+    return {
+        "id": str(d["_id"]),
+        "user_id": str(d["user_id"]) if d.get("user_id") else None,
+        "email": d.get("email"),
+        "message": d.get("message"),
+        "created_at": d.get("created_at").isoformat() + "Z" if d.get("created_at") else None,
+        "status": status,
+        "resolved": status == "resolved",
+        "resolved_at": d.get("resolved_at").isoformat() + "Z" if d.get("resolved_at") else None,
+    }
+
 @app.post("/support")
 @jwt_required(optional=True)  # allow both authenticated and anonymous
 def create_support_ticket():
@@ -995,14 +3199,11 @@ def create_support_ticket():
 
     if not message:
         return {"error": "message required"}, 400
+    if len(message) > SUPPORT_MESSAGE_MAX:
+        return {"error": f"Mesajul poate avea cel mult {SUPPORT_MESSAGE_MAX} caractere"}, 400
 
     uid = get_jwt_identity()  # None if anonymous
-    user_doc = None
-    if uid:
-        try:
-            user_doc = users.find_one({"_id": ObjectId(uid)})
-        except Exception:
-            user_doc = None
+    user_doc = _get_current_user() if uid else None
 
     # If anonymous and no email provided, we can't follow up
     if not uid and not email:
@@ -1022,46 +3223,103 @@ def create_support_ticket():
         "user_last_name": (user_doc or {}).get("last_name"),
     }
     support.insert_one(doc)
+    _support_counts["body"] = None
     return {"message": "Support message received"}, 201
 
 # --- Admin: list support messages ---
 @app.get("/admin/support")
 @admin_required
 def admin_support_list():
-    # optional ?resolved=true/false  (default: all)
-    resolved_q = request.args.get("resolved")
+    """
+    Newest first, keyset pages: ?status=open|resolved (legacy ?resolved=true/false)
+    &q=<words in message/email> &before=<last id> &limit=N -> {"items": [...], "next": cursor or null}
+    """
     q = {}
-    if resolved_q is not None:
+    status = request.args.get("status")
+    resolved_q = request.args.get("resolved")
+    if status is None and resolved_q is not None:
         if resolved_q.lower() in ("true", "1", "yes"):
-            q["resolved"] = True
+            status = "resolved"
         elif resolved_q.lower() in ("false", "0", "no"):
-            q["resolved"] = False
-
-    items = []
-    for d in support.find(q).sort("created_at", -1):
-        items.append({
-            "id": str(d["_id"]),
-            "user_id": str(d["user_id"]) if d.get("user_id") else None,
-            "email": d.get("email"),
-            "message": d.get("message"),
-            "created_at": d.get("created_at").isoformat() + "Z" if d.get("created_at") else None,
-            "resolved": bool(d.get("resolved", False)),
-        })
-    return {"items": items}
+            status = "open"
+    if status:
+        if status not in SUPPORT_STATUSES:
+            return {"error": "status must be open or resolved"}, 400
+        q["status"] = status
+    text = (request.args.get("q") or "").strip()
+    if text:
+        q["$text"] = {"$search": text}
+    before = request.args.get("before")
+    if before:
+        if not ObjectId.is_valid(before):
+            return {"error": "Invalid before cursor"}, 400
+        q["_id"] = {"$lt": ObjectId(before)}
+    try:
+        limit = min(max(int(request.args.get("limit", SUPPORT_PAGE)), 1), SUPPORT_PAGE_MAX)
+    except ValueError:
+        return {"error": "limit must be a number"}, 400
+
+    docs = list(support.find(q).sort("_id", -1).limit(limit + 1))
+    nxt = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return {"items": [_support_item(d) for d in docs[:limit]], "next": nxt}
+
+@app.get("/admin/support/counts")
+@admin_required
+def admin_support_counts():
+    # badge counts in one $facet, cached briefly (dropped on new tickets and status changes)
+    if _support_counts["body"] is None or time.monotonic() - _support_counts["at"] > ADMIN_COUNTS_TTL:
+        res = next(support.aggregate([{"$facet": {
+            "open": [{"$match": {"status": "open"}}, {"$count": "n"}],
+            "resolved": [{"$match": {"status": "resolved"}}, {"$count": "n"}],
+        }}]))
+        counts = {k: (v[0]["n"] if v else 0) for k, v in res.items()}
+        counts["total"] = counts["open"] + counts["resolved"]
+        _support_counts["body"] = counts
+        _support_counts["at"] = time.monotonic()
+    return _support_counts["body"]
 
 # --- Admin: mark resolved/unresolved ---
 @app.patch("/admin/support/<sid>")
 @admin_required
 def admin_support_resolve(sid):
     data = request.get_json() or {}
-    resolved = bool(data.get("resolved"))
+    status = data.get("status")
+    if status is None:
+        status = "resolved" if data.get("resolved") else "open"
+    if status not in SUPPORT_STATUSES:
+        return {"error": "status must be open or resolved"}, 400
+    update = {"$set": {"status": status}, "$unset": {"resolved": ""}}
+    if status == "resolved":
+        update["$set"]["resolved_at"] = dt.utcnow()
+    else:
+        update["$unset"]["resolved_at"] = ""
     try:
-        res = support.update_one({"_id": ObjectId(sid)}, {"$set": {"resolved": resolved}})
+        res = support.update_one({"_id": ObjectId(sid)}, update)
     except Exception:
         return {"error": "Invalid id"}, 400
     if res.matched_count == 0:
         return {"error": "Not found"}, 404
-    return {"message": "updated", "resolved": resolved}
+    _support_counts["body"] = None
+    return {"message": "updated", "status": status, "resolved": status == "resolved"}
+
+def _migrate_support_status():
+    """Fold the old `resolved` flag into `status` (idempotent; run by ensure_indexes)."""
+    r1 = support.update_many({"resolved": True}, {"$set": {"status": "resolved"}, "$unset": {"resolved": ""}})
+    r2 = support.update_many({"status": {"$nin": list(SUPPORT_STATUSES)}}, {"$set": {"status": "open"}, "$unset": {"resolved": ""}})
+    r3 = support.update_many({"resolved": {"$exists": True}}, {"$unset": {"resolved": ""}})
+    if r1.modified_count or r2.modified_count:
+        _support_counts["body"] = None
+    return r1, r2, r3
+
+@app.cli.command("migrate-support-status")
+def migrate_support_status_command():
+    """Fold the old `resolved` flag into `status` and drop the indexes it used."""
+    r1, r2, r3 = _migrate_support_status()
+    for name in ("resolved_1_created_at_1", "status_1"):
+        if name in support.index_information():
+            support.drop_index(name)
+    print(f"support tickets migrated: {r1.modified_count} resolved, {r2.modified_count} reopened as open, "
+          f"{r3.modified_count} flags dropped")
 
 # --- Admin: mutate users ---
 @app.patch("/admin/users/<user_id>/email")
@@ -1077,6 +3335,9 @@ def admin_update_email(user_id):
     except Exception as e:
         # Could be DuplicateKeyError from unique index
         return {"error": "Email already in use"}, 409
+    _refresh_search_terms(ObjectId(user_id))
+    _schedule_changed_for_medic(ObjectId(user_id))
+    _contacts_changed_for_user(ObjectId(user_id))
     return {"message": "updated"}
 
 @app.patch("/admin/users/<user_id>/password")
@@ -1086,7 +3347,7 @@ def admin_set_password(user_id):
     pw = (data.get("password") or "")
     if len(pw) < 6:
         return {"error": "password must be at least 6 chars"}, 400
-    hashed = bcrypt.hashpw(pw.encode("utf-8"), bcrypt.gensalt())
+    hashed = hash_password(pw.encode("utf-8"))
     users.update_one({"_id": ObjectId(user_id)}, {"$set": {"password_hash": hashed}})
     return {"message": "password updated"}
 
@@ -1095,11 +3356,30 @@ def admin_set_password(user_id):
 def admin_delete_user(user_id):
     oid = ObjectId(user_id)
     # Optional clean-up; keep minimal, expand if you want cascading deletes
+    _contacts_changed_for_user(oid)
     memberships.delete_many({"user_id": oid})
     busy_days.delete_many({"medic_id": oid})
+    _schedule_changed_for_medic(oid)
     shifts.delete_many({"medic_id": oid})
+    # archived months keep their shifts in Parquet, so their rollups stay for historical reports
+    archived = _archived_months()
+    shift_stats.delete_many({"medic_id": oid, "month": {"$nin": archived}} if archived else {"medic_id": oid})
+    availability.invalidate()
     messages.delete_many({"$or": [{"to": oid}, {"from": user_id}]})
+    # their own inbox + the DM summaries peers hold with them (dm ids embed both user ids);
+    # peers' badge counters drop whatever was still unread in those threads
+    peer_unread = conversations.find(
+        {"conversation_id": {"$regex": user_id}, "participant": {"$ne": oid}, "unread": {"$gt": 0}},
+        {"participant": 1, "unread": 1}
+    )
+    dec = [UpdateOne({"_id": c["participant"]}, {"$inc": {"unread_total": -c["unread"]}}) for c in peer_unread]
+    if dec:
+        users.bulk_write(dec, ordered=False)
+    conversations.delete_many({"$or": [{"participant": oid}, {"conversation_id": {"$regex": user_id}}]})
+    read_markers.delete_many({"$or": [{"participant": oid}, {"conversation_id": {"$regex": user_id}}]})
     res = users.delete_one({"_id": oid})
+    _invalidate_auth_cache(user_id)  # no user left to bump; its tokens now fail the version check
+    _user_counts_changed()
     if res.deleted_count == 0:
         return {"error": "not found"}, 404
     return {"message": "deleted"}
@@ -1144,3 +3424,382 @@ def users_basics():
             "global_role": u.get("global_role", "medic"),
         })
     return {"users": out}
+
+
+# --- Bulk import ---
+# POST /admin/import: one row per person, optionally with the center they join.
+#   columns: email, first_name, last_name, password, phone, status, center, role
+#   - new email: creates the user (password required; status defaults to approved)
+#   - known, approved email with no password: only adds the membership
+#   - center: center id or exact name; unknown names fail unless ?create_centers=1
+#   - role: medic (default) or lead (replaces the center's current lead, like assign-lead)
+# Everything is validated before anything is written; ?dry_run=1 stops there.
+# Passwords are hashed in a process pool, writes go out in IMPORT_CHUNK-sized batches.
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "5000"))
+IMPORT_CHUNK = 500
+IMPORT_HASH_PROCESSES = int(os.getenv("IMPORT_HASH_PROCESSES", str(os.cpu_count() or 2)))
+IMPORT_COLUMNS = ("email", "first_name", "last_name", "password", "phone", "status", "center", "role")
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _import_rows(raw: str, fmt: str):
+    """[(row number, dict or None, parse error or None)] with lower-cased, stripped keys and values."""
+    out = []
+    if fmt == "csv":
+        for i, r in enumerate(csv.DictReader(StringIO(raw)), start=1):
+            if None in r:  # more fields than the header has columns
+                out.append((i, None, "Mai multe valori decat coloane in antet"))
+                continue
+            out.append((i, {(k or "").strip().lower(): (v or "").strip() for k, v in r.items()}, None))
+    else:
+        lines = [ln for ln in raw.splitlines() if ln.strip()]
+        for i, line in enumerate(lines, start=1):
+            try:
+                r = json.loads(line)
+                if not isinstance(r, dict):
+                    raise ValueError
+            except ValueError:
+                out.append((i, None, "JSON invalid"))
+                continue
+            out.append((i, {str(k).strip().lower(): str(v).strip() for k, v in r.items() if v is not None}, None))
+    return out
+
+def _hash_passwords(passwords):
+    """bcrypt many passwords on all cores; small batches stay on the request's bcrypt pool."""
+    if not passwords:
+        return []
+    if len(passwords) < 2 * IMPORT_HASH_PROCESSES:
+        return [hash_password(pw) for pw in passwords]
+    salts = [bcrypt.gensalt(BCRYPT_ROUNDS) for _ in passwords]
+    # spawn, not fork: this process has Mongo, bcrypt and SSE threads running
+    with ProcessPoolExecutor(max_workers=IMPORT_HASH_PROCESSES, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(bcrypt.hashpw, passwords, salts, chunksize=16))
+
+@app.post("/admin/import")
+@admin_required
+def admin_import():
+    """
+    CSV or NDJSON upload (multipart "file" or raw body): ?format=csv|ndjson (default from the
+    file name, else csv) &dry_run=1 &create_centers=1
+    -> counts plus {"errors": [{"row", "email", "error"}]}; rows with errors are skipped.
+    """
+    upload = request.files.get("file")
+    raw = upload.read() if upload else request.get_data()
+    fmt = (request.args.get("format") or "").lower()
+    if not fmt:
+        fmt = "ndjson" if upload and (upload.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+    if fmt not in ("csv", "ndjson"):
+        return {"error": "format must be csv or ndjson"}, 400
+    try:
+        raw = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return {"error": "Fisierul trebuie sa fie UTF-8"}, 400
+    dry_run = request.args.get("dry_run", "").lower() in ("1", "true", "yes")
+    create_centers = request.args.get("create_centers", "").lower() in ("1", "true", "yes")
+
+    rows = _import_rows(raw, fmt)
+    if not rows:
+        return {"error": "Fisier gol"}, 400
+    if len(rows) > IMPORT_MAX_ROWS:
+        return {"error": f"Cel mult {IMPORT_MAX_ROWS} randuri per import"}, 400
+
+    errors = []
+    def fail(n, r, msg):
+        errors.append({"row": n, "email": (r or {}).get("email"), "error": msg})
+
+    # --- prefetch: existing users, centers, memberships (a few $in queries, not one per row)
+    # /register stores emails as typed, so match them case-insensitively
+    emails = {r["email"].lower() for _, r, _ in rows if r and r.get("email")}
+    known_users, known_status = {}, {}
+    email_list = sorted(emails)
+    for k in range(0, len(email_list), IMPORT_CHUNK):
+        for u in users.find({"email": {"$in": email_list[k:k + IMPORT_CHUNK]}}, {"email": 1, "status": 1}
+                            ).collation({"locale": "en", "strength": 2}):
+            known_users[u["email"].lower()] = u["_id"]
+            known_status[u["email"].lower()] = u.get("status")
+    center_refs = {r["center"] for _, r, _ in rows if r and r.get("center")}
+    center_ids = [ObjectId(c) for c in center_refs if ObjectId.is_valid(c)]
+    known_centers = {}  # ref (id string or name) -> oid
+    for c in centers.find({"$or": [{"_id": {"$in": center_ids}}, {"name": {"$in": list(center_refs)}}]}, {"name": 1}):
+        known_centers[str(c["_id"])] = c["_id"]
+        known_centers.setdefault(c.get("name"), c["_id"])
+    member_pairs, leads_elsewhere = set(), {}
+    if known_users:
+        for m in memberships.find({"user_id": {"$in": list(known_users.values())}}, {"center_id": 1, "user_id": 1, "role": 1}):
+            member_pairs.add((m["center_id"], m["user_id"]))
+            if m.get("role") == "lead":
+                leads_elsewhere[m["user_id"]] = m["center_id"]
+
+    # --- validate every row before writing anything
+    new_users, new_centers, joins = [], {}, []  # joins: (row, email, center key, role)
+    seen_emails, lead_for_center = set(), {}
+    for n, r, parse_error in rows:
+        if parse_error:
+            fail(n, r, parse_error)
+            continue
+        unknown = set(r) - set(IMPORT_COLUMNS)
+        if unknown:
+            fail(n, r, "Coloane necunoscute: " + ", ".join(sorted(unknown)))
+            continue
+        email = r.get("email", "").lower()
+        if not EMAIL_RE.match(email):
+            fail(n, r, "Email invalid")
+            continue
+        if email in seen_emails:
+            fail(n, r, "Email duplicat in fisier")
+            continue
+        role = (r.get("role") or "medic").lower()
+        if role not in ("medic", "lead"):
+            fail(n, r, "role trebuie sa fie medic sau lead")
+            continue
+        center_key = None
+        if r.get("center"):
+            ref = r["center"]
+            if ref in known_centers:
+                center_key = known_centers[ref]
+            elif create_centers and not ObjectId.is_valid(ref):
+                center_key = new_centers.setdefault(ref, ("new", ref))
+            else:
+                fail(n, r, f"Centru necunoscut: {ref}")
+                continue
+        elif r.get("role"):
+            fail(n, r, "role fara center")
+            continue
+
+        if email in known_users:
+            if r.get("password"):
+                fail(n, r, "Email deja inregistrat")
+                continue
+            if center_key is None:
+                fail(n, r, "Email deja inregistrat (fara centru de adaugat)")
+                continue
+            if known_status.get(email) != "approved":
+                fail(n, r, "Utilizatorul nu a fost aprobat")
+                continue
+            uid = known_users[email]
+            if (center_key, uid) in member_pairs and role == "medic":
+                fail(n, r, "Utilizatorul este deja membru al acestui centru")
+                continue
+            if role == "lead" and leads_elsewhere.get(uid) not in (None, center_key):
+                fail(n, r, "Medicul este deja coordonator al altui centru")
+                continue
+        else:
+            if not r.get("password"):
+                fail(n, r, "password obligatoriu pentru utilizatori noi")
+                continue
+            if len(r["password"]) < 6:
+                fail(n, r, "Parola trebuie sa aiba cel putin 6 caractere")
+                continue
+            if not r.get("first_name") or not r.get("last_name"):
+                fail(n, r, "first_name si last_name obligatorii")
+                continue
+            status = (r.get("status") or "approved").lower()
+            if status not in ("pending", "approved"):
+                fail(n, r, "status trebuie sa fie pending sau approved")
+                continue
+            new_users.append((n, email, r, status))
+        if role == "lead":
+            if center_key in lead_for_center:
+                fail(n, r, f"Al doilea coordonator pentru acelasi centru (randul {lead_for_center[center_key]})")
+                if new_users and new_users[-1][0] == n:
+                    new_users.pop()
+                continue
+            lead_for_center[center_key] = n
+        seen_emails.add(email)
+        if center_key is not None:
+            joins.append((n, email, center_key, role))
+
+    summary = {
+        "dry_run": dry_run,
+        "rows": len(rows),
+        "users_created": len(new_users),
+        "centers_created": len(new_centers),
+        "memberships": len(joins),
+        "leads_assigned": len(lead_for_center),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+    }
+    if dry_run:
+        return summary
+
+    # --- write: hash first (slow, and may fail), then centers, users, memberships
+    hashes = _hash_passwords([r["password"].encode("utf-8") for _, _, r, _ in new_users])
+    if new_centers:
+        names = list(new_centers)
+        res = centers.insert_many([{"name": name, "location": None} for name in names])
+        for name, oid in zip(names, res.inserted_ids):
+            new_centers[name] = oid
+    resolve_center = lambda key: new_centers[key[1]] if isinstance(key, tuple) else key
+
+    failed_rows = set()
+    for k in range(0, len(new_users), IMPORT_CHUNK):
+        chunk = new_users[k:k + IMPORT_CHUNK]
+        docs = [{
+            "first_name": r["first_name"],
+            "last_name": r["last_name"],
+            "email": email,
+            "phone": r.get("phone") or None,
+            "password_hash": pw_hash,
+            "status": status,
+            "global_role": "medic",
+            "search_terms": _search_terms(r["first_name"], r["last_name"], email),
+            "imported_at": dt.utcnow(),
+        } for (_, email, r, status), pw_hash in zip(chunk, hashes[k:k + IMPORT_CHUNK])]
+        try:
+            users.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for we in e.details.get("writeErrors", []):  # registered meanwhile
+                n, email, r, _ = chunk[we["index"]]
+                failed_rows.add(n)
+                fail(n, r, "Email deja inregistrat")
+        for (n, email, _, _), d in zip(chunk, docs):
+            if n not in failed_rows:
+                known_users[email] = d["_id"]
+
+    joins = [j for j in joins if j[0] not in failed_rows]
+    lead_centers = {resolve_center(c) for _, _, c, role in joins if role == "lead"}
+    previous_leads = set(memberships.find({"center_id": {"$in": list(lead_centers)}, "role": "lead"}).distinct("user_id")) if lead_centers else set()
+    # ops: (row, email, op); a center's demotion is charged to the row naming its new lead
+    lead_rows = {resolve_center(c): (n, email) for n, email, c, role in joins if role == "lead"}
+    ops = [(*lead_rows[c], UpdateMany({"center_id": c, "role": "lead"}, {"$set": {"role": "medic"}}))
+           for c in lead_centers]
+    for n, email, c, role in joins:
+        ops.append((n, email, UpdateOne(
+            {"center_id": resolve_center(c), "user_id": known_users[email]},
+            {"$set": {"role": role}} if role == "lead" else {"$setOnInsert": {"role": "medic"}},
+            upsert=True,
+        )))
+    joined = 0  # memberships created (promotions of existing members not counted)
+    pos = 0
+    while pos < len(ops):
+        chunk = ops[pos:pos + IMPORT_CHUNK]
+        try:
+            res = memberships.bulk_write([op for _, _, op in chunk], ordered=True)  # demotions before promotions
+            joined += res.upserted_count
+            pos += len(chunk)
+            continue
+        except BulkWriteError as e:
+            joined += e.details.get("nUpserted", 0)
+            we = e.details["writeErrors"][0]  # ordered: the chunk stopped at this op
+        app.logger.warning("import: membership write error: %s", we.get("errmsg"))
+        n, email, _ = chunk[we["index"]]
+        fail(n, {"email": email}, "Adaugarea in centru a esuat")
+        pos += we["index"] + 1
+        # a failed demotion must not leave two leads: drop that row's promotion as well
+        ops = ops[:pos] + [o for o in ops[pos:] if o[0] != n]
+
+    touched_users = {known_users[email] for _, email, _, _ in joins} | previous_leads
+    if touched_users:
+        _auth_changed(*touched_users)
+    _contacts_changed(*{resolve_center(c) for _, _, c, _ in joins})
+    _user_counts_changed()
+
+    summary.update({
+        "users_created": len(new_users) - len(failed_rows),
+        "memberships": joined,
+        "leads_assigned": len(lead_centers),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+    })
+    return summary, 201
+
+# --- Lifecycle ---
+# Production: gunicorn -c gunicorn.conf.py "register:create_app()"  (dev: flask --app register run)
+# Per-process services (change-stream watcher, notification worker) start in the process
+# that serves requests, once per pid, so a forking server never shares them. Indexes are
+# built by create_app() while the worker boots, never on the request path; `flask run`
+# doesn't call it, so run `flask --app register ensure-indexes` once in development.
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1").lower() in ("1", "true", "yes")
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))  # seconds /readyz waits for Mongo
+_started_pid = None
+_background = {}  # name -> Thread
+_lifecycle_lock = threading.Lock()
+_shutting_down = threading.Event()
+
+def start_background():
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    with _lifecycle_lock:
+        if _started_pid == os.getpid():
+            return
+        _background.clear()
+        if MESSAGE_STREAM_BACKEND == "changestream":
+            _background["message-watch"] = threading.Thread(target=_watch_message_inserts, name="message-watch", daemon=True)
+        if NOTIFY_WORKER:
+            _background["notify-worker"] = threading.Thread(target=_notification_worker, name="notify-worker", daemon=True)
+        for t in _background.values():
+            t.start()
+        _started_pid = os.getpid()
+
+def _after_fork_in_child():
+    # threads don't survive fork (a lock held by one of them would stay held): give the child
+    # fresh locks, its own bcrypt pool, empty counters, no SSE subscribers
+    global _hash_pool, _hash_slots, _metrics_lock, _subscribers_lock, _lifecycle_lock, _contacts_lock
+    global _notify_wakeup, _shutting_down
+    _metrics_lock, _subscribers_lock, _lifecycle_lock = threading.Lock(), threading.Lock(), threading.Lock()
+    _contacts_lock = threading.Lock()
+    _notify_wakeup, _shutting_down = threading.Event(), threading.Event()
+    if isinstance(schedule_cache, _LocalScheduleCache):
+        schedule_cache._lock = threading.Lock()
+    availability._lock = threading.RLock()
+    _hash_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+    _hash_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_QUEUE_MAX)
+    for d in (_route_latency, _route_status, _route_mongo, _mongo_commands, _hash_latency, _subscribers):
+        d.clear()
+    _stream_count["open"] = 0
+    _hash_rejected["count"] = 0
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+@app.before_request
+def _ensure_started():
+    start_background()  # no-op after the first request of each process
+
+def shutdown():
+    """Stop taking work and release the pools (gunicorn worker_exit, atexit)."""
+    if _shutting_down.is_set():
+        return
+    _shutting_down.set()
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
+    client.close()
+
+atexit.register(shutdown)
+
+def create_app():
+    if ENSURE_INDEXES:
+        try:
+            ensure_indexes()
+        except Exception:
+            # Mongo briefly down at boot: serve anyway, the indexes are already there after the first deploy
+            app.logger.exception("ensure_indexes failed; run `flask --app register ensure-indexes`")
+    start_background()
+    return app
+
+@app.get("/healthz")
+def healthz():
+    # liveness: the process answers; no dependencies checked
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    # readiness: Mongo reachable and background workers alive; 503 takes the pod out of rotation
+    checks = {}
+    try:
+        with mongo_timeout(READY_TIMEOUT):
+            client.admin.command("ping")
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {e.__class__.__name__}"
+    for name, t in _background.items():
+        checks[name] = "ok" if t.is_alive() else "dead"
+    if _shutting_down.is_set():
+        checks["shutdown"] = "in progress"
+    ready = all(v == "ok" for v in checks.values())
+    return {"status": "ready" if ready else "not ready", "checks": checks}, 200 if ready else 503
+
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create/verify all indexes: `flask --app register ensure-indexes`."""
+    ensure_indexes()
+    print("indexes ok")
+
+if __name__ == "__main__":
+    create_app().run(host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "5000")))